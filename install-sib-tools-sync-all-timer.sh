@@ -12,6 +12,15 @@ echo "Using workdir: $WORKDIR"
 
 read -p "Enter the location of the file which contains the keyring decrypt password: " KEYRING_ENV_FILE
 
+# Incremental fetching of Conscribo relations needs a modification date field,
+# or else probe fields (see sib_tools/conscribo/relation_snapshot.py). Without
+# either, --incremental still fetches all relations.
+read -p "Conscribo modification date field for incremental sync (empty if none): " CONSCRIBO_MODIFIED_FIELD
+read -p "Conscribo probe fields for incremental sync, comma separated (empty if none): " CONSCRIBO_PROBE_FIELDS
+
+# The local caches and snapshots are stored in the home directory
+SERVICE_HOME=$(getent passwd "$SERVICE_USER" | cut -d: -f6)
+
 # Create service unit (oneshot)
 cat <<EOF | sudo tee $SERVICE_FILE > /dev/null
 [Unit]
@@ -26,7 +35,9 @@ WorkingDirectory=$WORKDIR
 # Ensure venv/bin is preferred if present
 Environment=PYTHONUNBUFFERED=1
 Environment=PATH=$WORKDIR/.venv/bin:/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin
-ExecStart=python -m sib_tools sync all --mail-output
+Environment=CONSCRIBO_MODIFIED_FIELD=$CONSCRIBO_MODIFIED_FIELD
+Environment=CONSCRIBO_PROBE_FIELDS=$CONSCRIBO_PROBE_FIELDS
+ExecStart=python -m sib_tools sync all --mail-output --incremental
 
 # Load environment variables from secure file
 EnvironmentFile=$KEYRING_ENV_FILE
@@ -36,7 +47,7 @@ NoNewPrivileges=yes
 PrivateTmp=yes
 ProtectSystem=strict
 #ProtectHome=yes
-ReadWritePaths=$WORKDIR
+ReadWritePaths=$WORKDIR $SERVICE_HOME
 
 [Install]
 WantedBy=multi-user.target
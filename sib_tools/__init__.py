@@ -1 +0,0 @@
-from .canonical import canonical_key
@@ -1,69 +1,81 @@
 import argparse
+import importlib
+import sys
 from argparse import ArgumentParser
 from .auth import configure_keyring
 configure_keyring()
 
-from . import (
-    sync_command,
-    list_command,
-    api_command,
-    check_command,
-    email,
-    serve_command,
-    auth_command,
-)
 from .command_exception import CommandException
-import os
-import keyring
+
+
+# Command name -> (module that implements it, help text, extra parser options).
+# A command's module is only imported when that command is invoked, so that
+# e.g. `sib-tools list members` does not load boto3 or the Google clients.
+COMMANDS: dict[str, tuple[str, str, dict]] = {
+    "sync": (
+        "sync_command",
+        "Synchronize members to other services (e.g. Laposta, or website accounts).",
+        {"formatter_class": argparse.ArgumentDefaultsHelpFormatter},
+    ),
+    "list": ("list_command", "List information", {}),
+    "api": (
+        "api_command",
+        "Issue a raw API command (e.g. 'GET /relations/groups/')",
+        {},
+    ),
+    "check": ("check_command", "Check data consistency and integrity.", {}),
+    "handle-email": (
+        "email.email_handler",
+        "Handle an incoming .eml file and process its contents.",
+        {},
+    ),
+    "serve": ("serve_command", "Run server endpoints (e.g. for SNS webhooks)", {}),
+    # Auth command group for Cognito actions
+    "auth": ("auth_command", "Cognito user management actions", {}),
+}
+
+
+def find_command(argv: list[str]) -> str | None:
+    # Global options are all flags, so the first positional is the command
+    for arg in argv:
+        if not arg.startswith("-"):
+            return arg
+
+    return None
 
 
 def main(args=None):
+    argv = sys.argv[1:] if args is None else list(args)
+
     parser = ArgumentParser(
         prog="sib-tools",
         description="Tools for member administration, made for SIB-Utrecht.",
     )
     parser.set_defaults(func=lambda args: parser.print_help())
+    parser.add_argument(
+        "--refresh-schema",
+        action="store_true",
+        help="Refresh the cached canonical key spreadsheet before running the command.",
+    )
 
     subparser = parser.add_subparsers(
         title="Commands", description="Available commands", dest="command"
     )
 
-    sync_command.add_parse_args(
-        subparser.add_parser(
-            "sync",
-            help="Synchronize members to other services (e.g. Laposta, or website accounts).",
-            formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-        )
-    )
+    command = find_command(argv)
+    for name, (module_name, help_text, options) in COMMANDS.items():
+        command_parser = subparser.add_parser(name, help=help_text, **options)
+        if name == command:
+            module = importlib.import_module(f".{module_name}", __package__)
+            module.add_parse_args(command_parser)
 
-    list_command.add_parse_args(subparser.add_parser("list", help="List information"))
+    args = parser.parse_args(args=argv)
 
-    api_command.add_parse_args(
-        subparser.add_parser(
-            "api", help="Issue a raw API command (e.g. 'GET /relations/groups/')"
-        )
-    )
-
-    check_command.add_parse_args(
-        subparser.add_parser("check", help="Check data consistency and integrity.")
-    )
-
-    email.add_parse_args(subparser)
+    if args.refresh_schema:
+        from .canonical import canonical_key
 
-    serve_command.add_parse_args(
-        subparser.add_parser(
-            "serve", help="Run server endpoints (e.g. for SNS webhooks)"
-        )
-    )
-
-    # New: auth command group for Cognito actions
-    auth_command.add_parse_args(
-        subparser.add_parser(
-            "auth", help="Cognito user management actions"
-        )
-    )
+        canonical_key.request_refresh()
 
-    args = parser.parse_args(args=args)
     try:
         args.func(args)
     except CommandException as e:
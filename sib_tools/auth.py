@@ -1,17 +1,12 @@
 import os
-import keyring
 import logging
 import sys
 from typing import Any, Optional, cast
 
-try:
-    from beaupy import select
-except Exception:
-    select = None  # type: ignore
-
 
 def configure_keyring():
     if "KEYRING_CRYPTFILE_PASSWORD" in os.environ:
+        import keyring
         from keyrings.cryptfile.cryptfile import CryptFileKeyring
 
         kr = CryptFileKeyring()
@@ -113,6 +108,11 @@ def check_available_auth(logger=None, non_interactive=False, signin_action=None)
     available_subactions: list[str] = []
 
     if not signin_action:
+        try:
+            from beaupy import select
+        except Exception:
+            select = None  # type: ignore
+
         msg(
             f"\n{BOLD}Select a service to sign in, rotate, or sign out (or choose 'Cancel' to skip):{RESET}"
         )
@@ -2,7 +2,7 @@ import json
 import logging
 from argparse import ArgumentParser, Namespace
 
-from .cognito.client import cognito_client
+from .cognito.client import get_cognito_client
 from .cognito.constants import user_pool_id
 
 
@@ -12,7 +12,7 @@ def _attributes_to_dict(attrs: list[dict]) -> dict:
 
 def _find_user_by_email(email: str):
     # Cognito filter syntax requires quoted value
-    resp = cognito_client.list_users(UserPoolId=user_pool_id, Filter=f'email = "{email}"')
+    resp = get_cognito_client().list_users(UserPoolId=user_pool_id, Filter=f'email = "{email}"')
     users = resp.get("Users", [])
     if not users:
         return None
@@ -33,7 +33,7 @@ def _list_webauthn_credentials_with_token(access_token: str) -> list:
         params = {"AccessToken": access_token}
         if next_token:
             params["NextToken"] = next_token
-        resp = cognito_client.list_webauthn_credentials(**params)
+        resp = get_cognito_client().list_webauthn_credentials(**params)
         creds = resp.get("WebAuthnCredentials") or resp.get("Credentials") or []
         creds_all.extend(creds)
         next_token = resp.get("NextToken") or resp.get("PaginationToken")
@@ -43,7 +43,7 @@ def _list_webauthn_credentials_with_token(access_token: str) -> list:
 
 
 def _get_user_auth_factors_with_token(access_token: str) -> dict:
-    return cognito_client.get_user_auth_factors(AccessToken=access_token)
+    return get_cognito_client().get_user_auth_factors(AccessToken=access_token)
 
 
 def handle_auth_show(args: Namespace):
@@ -99,7 +99,7 @@ def handle_auth_remove_password(args: Namespace):
         return
     username = user.get("Username")
     try:
-        cognito_client.admin_reset_user_password(UserPoolId=user_pool_id, Username=username)
+        get_cognito_client().admin_reset_user_password(UserPoolId=user_pool_id, Username=username)
         print(f"Password reset initiated for {email} (Username={username}).")
     except Exception as e:
         print(f"Failed to reset/remove password for {email}: {e}")
@@ -129,7 +129,7 @@ def handle_auth_remove_passkeys(args: Namespace):
             if not cred_id:
                 continue
             try:
-                cognito_client.delete_webauthn_credential(
+                get_cognito_client().delete_webauthn_credential(
                     AccessToken=access_token,
                     CredentialId=cred_id,
                 )
@@ -149,7 +149,7 @@ def _set_email_verified(email: str, verified: bool):
         return
     username = user.get("Username")
     try:
-        cognito_client.admin_update_user_attributes(
+        get_cognito_client().admin_update_user_attributes(
             UserPoolId=user_pool_id,
             Username=username,
             UserAttributes=[{"Name": "email_verified", "Value": "true" if verified else "false"}],
@@ -210,7 +210,7 @@ def handle_auth_set_mfa_preference(args: Namespace):
                 "Enabled": enabled,
                 "PreferredMfa": preferred,
             }
-        cognito_client.admin_set_user_mfa_preference(**params)
+        get_cognito_client().admin_set_user_mfa_preference(**params)
         print(f"Set {method} MFA to '{state}' for {email} (Username={username}).")
     except Exception as e:
         print(f"Failed to set {method} MFA '{state}' for {email}: {e}")
@@ -0,0 +1,3 @@
+"""
+Small benchmarks, run as `python -m sib_tools.benchmarks.<name>`.
+"""
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of converting Conscribo relations to canonical form.
+
+Compares the old approach, which rebuilt the Conscribo-to-key dict from the
+parsed spreadsheet for every relation, with the compiled CanonicalSchema.
+
+By default, synthetic spreadsheet rows and relations are used, so no network
+is needed. Pass --live to use the real spreadsheet.
+
+Usage: python -m sib_tools.benchmarks.canonical_schema [--relations N] [--live]
+"""
+
+import argparse
+import timeit
+
+from ..canonical import canonical_key
+from ..canonical.canonical_key import CanonicalSchema, flatten_dict, SYSTEM_COLUMNS
+
+
+def make_synthetic_rows(count: int = 60) -> list[dict[str, str]]:
+    return [
+        {
+            "Key": f"key_{i}",
+            **{system: f"{system.lower()}_field_{i}" for system in SYSTEM_COLUMNS},
+        }
+        for i in range(count)
+    ]
+
+
+def make_synthetic_relations(rows: list[dict[str, str]], count: int) -> list[dict]:
+    return [
+        {
+            **{row["Conscribo"]: f"value {n}" for row in rows},
+            "unmapped": {"nested": n},
+        }
+        for n in range(count)
+    ]
+
+
+def legacy_relation_to_canonical(relation: dict, rows: list[dict[str, str]]) -> dict:
+    # Equivalent of relation_to_canonical before CanonicalSchema: the mapping
+    # was rebuilt from the parsed rows on every call.
+    to_canonical = {
+        row["Conscribo"]: row["Key"]
+        for row in rows
+        if row.get("Conscribo") and row.get("Key")
+    }
+
+    canonical = dict()
+    for key, value in flatten_dict(relation).items():
+        new_key = to_canonical.get(key, None)
+
+        if new_key is not None:
+            canonical[new_key] = value
+            continue
+
+        other = canonical.setdefault("other", dict())
+        other[key] = value
+
+    return canonical
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--relations", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="Use the real spreadsheet")
+    args = parser.parse_args()
+
+    rows = canonical_key.get_parsed_data() if args.live else make_synthetic_rows()
+    relations = make_synthetic_relations(rows, args.relations)
+    schema = CanonicalSchema.from_rows(rows)
+
+    assert all(
+        legacy_relation_to_canonical(r, rows) == schema.to_canonical("Conscribo", r)
+        for r in relations[:10]
+    )
+
+    def run_legacy():
+        for relation in relations:
+            legacy_relation_to_canonical(relation, rows)
+
+    def run_schema():
+        for relation in relations:
+            schema.to_canonical("Conscribo", relation)
+
+    print(f"{len(rows)} spreadsheet rows, {len(relations)} relations")
+    for name, fn in [("per-call dict rebuild", run_legacy), ("CanonicalSchema", run_schema)]:
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print(f"  {name:<22} {best * 1e6 / len(relations):8.2f} µs per relation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Import-time benchmark of the command line entry point.
+
+Runs the CLI in a fresh interpreter with `-X importtime` and reports the
+cumulative import time and the slowest top-level imports. Fails if any of the
+heavy client libraries is imported, as those should only be loaded by the
+command that needs them.
+
+Usage: python -m sib_tools.benchmarks.import_time [--budget MS] [-- ARGS...]
+(the CLI arguments default to `--help`)
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+# Libraries that must not be loaded just to parse the command line
+HEAVY_MODULES = (
+    "boto3",
+    "botocore",
+    "googleapiclient",
+    "google.oauth2",
+    "flask",
+    "cryptography",
+    "bs4",
+    "dkim",
+    "beaupy",
+)
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(cli_args: list[str]) -> list[tuple[str, int, int, int]]:
+    """
+    Returns (module, self us, cumulative us, depth) for every import done while
+    running `python -m sib_tools <cli_args>`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "sib_tools", *cli_args],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        timeout=60,
+    )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+
+        self_us, cumulative_us, indent, module = match.groups()
+        imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help="Fail if the total import time exceeds this many milliseconds",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("cli_args", nargs="*", default=["--help"])
+    args = parser.parse_args()
+
+    imports = measure(args.cli_args)
+    top_level = [i for i in imports if i[3] == 0]
+    total_ms = sum(cumulative for _, _, cumulative, _ in top_level) / 1000
+
+    print(f"sib-tools {' '.join(args.cli_args)}: {len(imports)} modules, {total_ms:.1f} ms")
+    for module, _, cumulative, _ in sorted(top_level, key=lambda i: -i[2])[: args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    failed = False
+    loaded = {module for module, _, _, _ in imports}
+    heavy = sorted(
+        m for m in HEAVY_MODULES if m in loaded or any(l.startswith(m + ".") for l in loaded)
+    )
+    if heavy:
+        print(f"Heavy modules imported: {', '.join(heavy)}")
+        failed = True
+
+    if args.budget is not None and total_ms > args.budget:
+        print(f"Import time {total_ms:.1f} ms exceeds budget of {args.budget:.1f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
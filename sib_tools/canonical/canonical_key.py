@@ -1,7 +1,14 @@
 import requests
 import json
+import logging
+import os
 import regex
 import urllib
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Any, Mapping
 from urllib.parse import urlparse, urlencode
 
 # url = "https://docs.google.com/spreadsheets/d/1l-DQhGXPq3QlMPor1aZk2Cw_VpxaHUZWDPFnt9Cd0Hg/edit?usp=sharing"
@@ -39,19 +46,6 @@ tsv_url = get_tsv_url(url)
 
 
 
-def get_tsv_data(url):
-    """
-    Fetches the TSV data from the given URL.
-    """
-    response = requests.get(url)
-    # print(f"Status code: {response.status_code}")
-    # print(f"Response text: {response.text[:100]}...")  # Print first 100 characters of the response
-
-    if response.status_code == 200:
-        return response.text
-    else:
-        raise Exception(f"Failed to fetch data: {response.status_code}")
-    
 # def make_homogeneous(data):
 #     row_length = len(data[0])
 
@@ -84,135 +78,262 @@ def parse_tsv_data(tsv_data : str):
     
     return data
 
-def fetch_and_parse_tsv_data():
+
+logger = logging.getLogger(__name__)
+
+# The spreadsheet is cached on disk, so starting the CLI does not have to wait
+# for (or fail without) docs.google.com. The cached copy is served right away,
+# and refreshed in the background once it is older than
+# SCHEMA_REFRESH_INTERVAL. A background refresh only updates the file, so the
+# mapping never changes halfway through a run.
+SCHEMA_CACHE_PATH = os.path.expanduser("~/.sib_canonical_key.json")
+SCHEMA_CACHE_VERSION = 1
+SCHEMA_REFRESH_INTERVAL = timedelta(hours=12)
+
+
+def read_schema_cache() -> dict | None:
+    try:
+        with open(SCHEMA_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cache.get("version") != SCHEMA_CACHE_VERSION or cache.get("url") != tsv_url:
+        return None
+
+    return cache
+
+
+def write_schema_cache(cache: dict):
+    # Write to a temporary file first, so an interrupted write never leaves a
+    # truncated cache behind.
+    tmp_path = f"{SCHEMA_CACHE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, SCHEMA_CACHE_PATH)
+
+
+def refresh_schema_cache() -> dict:
+    """
+    Fetch the spreadsheet if it changed since the cached copy (using ETag and
+    Last-Modified), update the cache on disk, and return the cache.
+    """
+    cache = read_schema_cache()
+    now = datetime.now().isoformat()
+
+    headers = {}
+    if cache is not None:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    response = requests.get(tsv_url, headers=headers, timeout=30)
+
+    if response.status_code == 304 and cache is not None:
+        logger.debug("Canonical key spreadsheet unchanged.")
+        cache["checked_at"] = now
+    elif response.status_code == 200:
+        cache = {
+            "version": SCHEMA_CACHE_VERSION,
+            "url": tsv_url,
+            "fetched_at": now,
+            "checked_at": now,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "tsv": response.text,
+        }
+    else:
+        raise Exception(f"Failed to fetch data: {response.status_code}")
+
+    write_schema_cache(cache)
+    return cache
+
+
+_refresh_thread: threading.Thread | None = None
+
+
+def refresh_schema_cache_in_background():
+    global _refresh_thread
+
+    if _refresh_thread is not None and _refresh_thread.is_alive():
+        return
+
+    def run():
+        try:
+            refresh_schema_cache()
+        except Exception as e:
+            logger.warning(f"Background refresh of canonical key spreadsheet failed: {e}")
+
+    _refresh_thread = threading.Thread(target=run, daemon=True)
+    _refresh_thread.start()
+
+
+def load_tsv_data(refresh: bool = False) -> str:
     """
-    Main function to fetch and parse the TSV data.
+    Returns the spreadsheet TSV, from the disk cache when possible. If refresh
+    is True, the cache is brought up to date first.
     """
-    tsv_data = get_tsv_data(tsv_url)
-    parsed_data = parse_tsv_data(tsv_data)
-    return parsed_data
+    cache = read_schema_cache()
+
+    if cache is None or refresh:
+        try:
+            cache = refresh_schema_cache()
+        except Exception as e:
+            if cache is None:
+                raise
+            logger.warning(f"Could not refresh canonical key spreadsheet, using cached copy: {e}")
+
+        return cache["tsv"]
+
+    checked_at = datetime.fromisoformat(cache["checked_at"])
+    if datetime.now() - checked_at > SCHEMA_REFRESH_INTERVAL:
+        refresh_schema_cache_in_background()
+
+    return cache["tsv"]
+
 
 _parsed_data = None
+_refresh_requested = False
+
+
+def request_refresh():
+    """
+    Make the next load of the spreadsheet bring the disk cache up to date
+    first, instead of serving the cached copy (used by --refresh-schema).
+    """
+    global _parsed_data, _schema, _refresh_requested
+
+    _refresh_requested = True
+    _parsed_data = None
+    _schema = None
+
 
 def get_parsed_data():
-    global _parsed_data
+    global _parsed_data, _refresh_requested
 
     if _parsed_data is not None:
         return _parsed_data
 
-    _parsed_data = fetch_and_parse_tsv_data()
+    _parsed_data = parse_tsv_data(load_tsv_data(refresh=_refresh_requested))
+    _refresh_requested = False
     return _parsed_data
-    
-def get_register_form_to_key() -> dict[str, str]:
-    parsed_data = get_parsed_data()
-    
-    register_form_to_key = {
-        row["RegisterForm"]: row["Key"]
-
-        for row in parsed_data
-        if row.get("RegisterForm") and row.get("Key")
-    }
 
-    return register_form_to_key
 
-def get_cognito_to_key() -> dict:
-    parsed_data = get_parsed_data()
+# Columns of the spreadsheet that name the field of a system for each
+# canonical key.
+SYSTEM_COLUMNS = ("RegisterForm", "Cognito", "Conscribo", "ConscriboAlumni", "Laposta")
 
-    cognito_to_key = {
-        row["Cognito"]: row["Key"]
 
-        for row in parsed_data
-        if row.get("Cognito") and row.get("Key")
-    }
+@dataclass(frozen=True)
+class CanonicalSchema:
+    """
+    Compiled mapping tables between canonical keys and the field names of each
+    system (a column in the spreadsheet), built once per process.
 
-    return cognito_to_key
+    to_key[system] maps a field name of the system to the canonical key, and
+    from_key[system] maps the canonical key back. The maps are read-only.
+    """
 
-def get_key_to_cognito() -> dict:
-    parsed_data = get_parsed_data()
+    to_key: Mapping[str, Mapping[str, str]]
+    from_key: Mapping[str, Mapping[str, str]]
 
-    key_to_cognito = {
-        row["Key"]: row["Cognito"]
+    @classmethod
+    def from_rows(cls, rows: list[dict[str, str]]) -> "CanonicalSchema":
+        to_key: dict[str, dict[str, str]] = {system: dict() for system in SYSTEM_COLUMNS}
+        from_key: dict[str, dict[str, str]] = {system: dict() for system in SYSTEM_COLUMNS}
 
-        for row in parsed_data
-        if row.get("Key") and row.get("Cognito")
-    }
+        for row in rows:
+            key = row.get("Key")
+            if not key:
+                continue
 
-    return key_to_cognito
+            for system in SYSTEM_COLUMNS:
+                field = row.get(system)
+                if not field:
+                    continue
 
-def get_conscribo_to_key() -> dict:
-    parsed_data = get_parsed_data()
+                to_key[system][field] = key
+                from_key[system][key] = field
 
-    conscribo_to_key = {
-        row["Conscribo"]: row["Key"]
+        return cls(
+            to_key=MappingProxyType(
+                {k: MappingProxyType(v) for k, v in to_key.items()}
+            ),
+            from_key=MappingProxyType(
+                {k: MappingProxyType(v) for k, v in from_key.items()}
+            ),
+        )
 
-        for row in parsed_data
-        if row.get("Conscribo") and row.get("Key")
-    }
+    def to_canonical(self, system: str, record: dict) -> dict[str, Any]:
+        """
+        Convert a record of the given system to canonical keys. Nested dicts
+        are flattened first. Fields without a canonical key end up in
+        canonical["other"].
+        """
+        to_canonical = self.to_key[system]
+        canonical: dict[str, Any] = dict()
 
-    return conscribo_to_key
+        for key, value in flatten_dict(record).items():
+            new_key = to_canonical.get(key, None)
 
+            if new_key is not None:
+                canonical[new_key] = value
+                continue
 
-def get_conscribo_alumnus_to_key() -> dict:
-    parsed_data = get_parsed_data()
+            other = canonical.setdefault("other", dict())
+            other[key] = value
 
-    conscribo_to_key = {
-        row["ConscriboAlumni"]: row["Key"]
+        return canonical
 
-        for row in parsed_data
-        if row.get("ConscriboAlumni") and row.get("Key")
-    }
 
-    return conscribo_to_key
+_schema: CanonicalSchema | None = None
+_schema_lock = threading.Lock()
 
 
-def get_key_to_conscribo() -> dict:
-    parsed_data = get_parsed_data()
-
-    key_to_conscribo = {
-        row["Key"]: row["Conscribo"]
+def get_schema() -> CanonicalSchema:
+    """
+    Returns the compiled schema, building it on first use.
+    """
+    global _schema
 
-        for row in parsed_data
-        if row.get("Key") and row.get("Conscribo")
-    }
+    if _schema is None:
+        with _schema_lock:
+            if _schema is None:
+                _schema = CanonicalSchema.from_rows(get_parsed_data())
 
-    return key_to_conscribo
+    return _schema
 
-def get_key_to_conscribo_alumnus() -> dict:
-    parsed_data = get_parsed_data()
 
-    key_to_conscribo_alumnus = {
-        row["Key"]: row["ConscriboAlumni"]
+def get_register_form_to_key() -> dict[str, str]:
+    return dict(get_schema().to_key["RegisterForm"])
 
-        for row in parsed_data
-        if row.get("Key") and row.get("ConscriboAlumni")
-    }
+def get_cognito_to_key() -> dict:
+    return dict(get_schema().to_key["Cognito"])
 
-    return key_to_conscribo_alumnus
+def get_key_to_cognito() -> dict:
+    return dict(get_schema().from_key["Cognito"])
 
+def get_conscribo_to_key() -> dict:
+    return dict(get_schema().to_key["Conscribo"])
 
-def get_key_to_laposta() -> dict:
-    parsed_data = get_parsed_data()
 
-    key_to_laposta = {
-        row["Key"]: row["Laposta"]
+def get_conscribo_alumnus_to_key() -> dict:
+    return dict(get_schema().to_key["ConscriboAlumni"])
 
-        for row in parsed_data
-        if row.get("Key") and row.get("Laposta")
-    }
 
-    return key_to_laposta
+def get_key_to_conscribo() -> dict:
+    return dict(get_schema().from_key["Conscribo"])
 
-def get_laposta_to_key() -> dict:
-    parsed_data = get_parsed_data()
+def get_key_to_conscribo_alumnus() -> dict:
+    return dict(get_schema().from_key["ConscriboAlumni"])
 
-    laposta_to_key = {
-        row["Laposta"]: row["Key"]
 
-        for row in parsed_data
-        if row.get("Laposta") and row.get("Key")
-    }
+def get_key_to_laposta() -> dict:
+    return dict(get_schema().from_key["Laposta"])
 
-    return laposta_to_key
+def get_laposta_to_key() -> dict:
+    return dict(get_schema().to_key["Laposta"])
 
 def flatten_dict(a : dict) -> dict:
     result = dict()
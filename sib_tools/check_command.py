@@ -88,6 +88,33 @@ def handle_check(args: Namespace):
                 include_alumni=args.include_alumni or args.only_alumni,
                 include_members=not args.only_alumni,
             )
+        elif args.healthcheck == "pdok-address-index":
+            from .conscribo.address_index import build_from_pdok_cache, index_stats
+
+            counts = build_from_pdok_cache()
+            logger.info(
+                f"Indexed {counts['postal_codes']} postal codes with {counts['addresses']} "
+                f"addresses from {counts['responses']} cached PDOK responses."
+            )
+            stats = index_stats()
+            logger.info(
+                f"The address index now holds {stats['postal_codes']} postal codes "
+                f"and {stats['addresses']} addresses."
+            )
+        elif args.healthcheck == "pdok-cache-stats":
+            from .conscribo.check_address import PDOK_CACHE_DIR
+            from .conscribo.file_cache import get_cache_for_dir
+
+            stats = get_cache_for_dir(PDOK_CACHE_DIR).stats()
+            logger.info(f"PDOK response cache: {stats['path']}")
+            logger.info(f"  Entries: {stats['entries']}")
+            logger.info(
+                f"  Size: {stats['bytes'] / 1024:.0f} KiB of {stats['max_bytes'] / 1024 / 1024:.0f} MiB "
+                f"(file: {stats['file_bytes'] / 1024:.0f} KiB)"
+            )
+            if stats["least_recently_used"] is not None:
+                lru = datetime.fromtimestamp(stats["least_recently_used"]).astimezone()
+                logger.info(f"  Least recently used entry: {lru.isoformat(' ', 'seconds')}")
         elif getattr(args, "healthcheck", None) == "available-auth":
             check_available_auth(
                 logger=logger,
@@ -178,6 +205,14 @@ def add_parse_args(parser: ArgumentParser):
         action="store_true",
         help="Only check alumni addresses (exclude members)",
     )
+    create_subparser(
+        "pdok-address-index",
+        help="Build the local PDOK address index from the cached PDOK responses.",
+    )
+    create_subparser(
+        "pdok-cache-stats",
+        help="Show the size and usage of the PDOK response cache.",
+    )
     available_auth_parser = create_subparser(
         "available-auth",
         help="Check which services have credentials and interactively sign in if missing.",
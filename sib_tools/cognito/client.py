@@ -1,5 +1,8 @@
 import boto3
+import random
+import threading
 from time import sleep
+from botocore.exceptions import ClientError
 import json
 import logging
 import sys
@@ -25,4 +28,49 @@ def create_cognito_client():
     )
 
 
-cognito_client = create_cognito_client()
+cognito_client = None
+cognito_client_lock = threading.Lock()
+
+
+def get_cognito_client():
+    """
+    Returns the shared Cognito client, creating it on first use. Creating it
+    may ask for AWS credentials, so this should not happen at import time.
+    """
+    global cognito_client
+
+    with cognito_client_lock:
+        if cognito_client is None:
+            cognito_client = create_cognito_client()
+
+        return cognito_client
+
+
+# Error codes with which Cognito signals that a request was throttled
+THROTTLING_ERROR_CODES = {
+    "TooManyRequestsException",
+    "ThrottlingException",
+    "LimitExceededException",
+}
+
+
+def call_with_backoff(fn, *args, max_retries: int = 6, base_delay: float = 0.5, **kwargs):
+    """
+    Call a Cognito client method, retrying with exponential backoff (with
+    jitter) when the call is throttled.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code not in THROTTLING_ERROR_CODES or attempt >= max_retries:
+                raise
+
+            delay = base_delay * (2 ** attempt) * (0.5 + random.random())
+            logging.getLogger(__name__).warning(
+                f"Cognito throttled ({code}), retrying in {delay:.1f}s"
+            )
+            sleep(delay)
+            attempt += 1
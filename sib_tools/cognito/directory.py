@@ -0,0 +1,226 @@
+"""
+Process-wide directory of the users in the Cognito user pool.
+
+The syncs each need the full list of Cognito users. The directory lists the
+pool once, at the maximum page size, and indexes the users by sub, e-mail,
+Conscribo id and WordPress user id. Creates, updates and deletes done through
+the directory are applied to the cached users as well, so later readers see
+the pool as it is after those writes.
+"""
+
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from .client import call_with_backoff, get_cognito_client, user_pool_id
+
+# Maximum page size of ListUsers
+LIST_USERS_LIMIT = 60
+
+# How many attribute updates update_many sends at the same time
+DEFAULT_WRITE_WORKERS = 4
+
+
+def attributes_to_dict(attributes: list[dict]) -> dict[str, str]:
+    return {attr["Name"]: attr["Value"] for attr in attributes}
+
+
+class CognitoDirectory:
+    def __init__(self, pool_id: str = user_pool_id):
+        self.pool_id = pool_id
+        self.lock = threading.RLock()
+        self.loaded = False
+        # Raw users as returned by ListUsers, by Username
+        self.users: dict[str, dict[str, Any]] = {}
+        self.by_sub: dict[str, str] = {}
+        self.by_email: dict[str, str] = {}
+        self.by_conscribo_id: dict[str, str] = {}
+        self.by_wp_user_id: dict[int, str] = {}
+
+    def fetch_all(self) -> list[dict[str, Any]]:
+        client = get_cognito_client()
+        users = []
+        kwargs: dict[str, Any] = {"UserPoolId": self.pool_id, "Limit": LIST_USERS_LIMIT}
+
+        while True:
+            response = call_with_backoff(client.list_users, **kwargs)
+            users.extend(response["Users"])
+
+            pagination_token = response.get("PaginationToken")
+            if pagination_token is None:
+                return users
+
+            kwargs["PaginationToken"] = pagination_token
+
+    def load(self, force: bool = False):
+        with self.lock:
+            if self.loaded and not force:
+                return
+
+            self.users = {}
+            self.by_sub, self.by_email = {}, {}
+            self.by_conscribo_id, self.by_wp_user_id = {}, {}
+            for user in self.fetch_all():
+                self.add(user)
+            self.loaded = True
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded = False
+            self.users = {}
+
+    def index_keys(self, user: dict[str, Any]) -> list[tuple[dict, Any]]:
+        from .list_users import cognito_user_to_canonical
+
+        canonical = cognito_user_to_canonical(copy.deepcopy(user))
+        keys: list[tuple[dict, Any]] = []
+        for index, key in (
+            (self.by_sub, canonical.get("cognito_sub")),
+            (self.by_email, (canonical.get("email") or "").lower() or None),
+            (self.by_conscribo_id, canonical.get("conscribo_id") or None),
+            (self.by_wp_user_id, canonical.get("wp_user_id")),
+        ):
+            if key is not None:
+                keys.append((index, key))
+
+        return keys
+
+    def add(self, user: dict[str, Any]):
+        username = user["Username"]
+        self.users[username] = user
+        for index, key in self.index_keys(user):
+            index[key] = username
+
+    def remove(self, username: str):
+        user = self.users.pop(username, None)
+        if user is None:
+            return
+
+        for index, key in self.index_keys(user):
+            if index.get(key) == username:
+                del index[key]
+
+    def resolve(self, username: str) -> str | None:
+        """
+        Returns the Username of the user known as username, which may also be
+        its sub or e-mail address.
+        """
+        if username in self.users:
+            return username
+
+        return self.by_sub.get(username) or self.by_email.get(username.lower())
+
+    def list_users(self) -> list[dict[str, Any]]:
+        """
+        Returns copies of all raw users, like ListUsers does.
+        """
+        with self.lock:
+            self.load()
+            return copy.deepcopy(list(self.users.values()))
+
+    def list_users_canonical(self) -> list[dict[str, Any]]:
+        from .list_users import cognito_user_to_canonical
+
+        return [cognito_user_to_canonical(user) for user in self.list_users()]
+
+    def get_user(self, index: dict, key: Any) -> dict[str, Any] | None:
+        from .list_users import cognito_user_to_canonical
+
+        with self.lock:
+            self.load()
+            username = index.get(key)
+            if username is None:
+                return None
+
+            return cognito_user_to_canonical(copy.deepcopy(self.users[username]))
+
+    def get_by_sub(self, sub: str) -> dict[str, Any] | None:
+        return self.get_user(self.by_sub, sub)
+
+    def get_by_email(self, email: str) -> dict[str, Any] | None:
+        return self.get_user(self.by_email, email.lower())
+
+    def get_by_conscribo_id(self, conscribo_id: str) -> dict[str, Any] | None:
+        return self.get_user(self.by_conscribo_id, conscribo_id)
+
+    def get_by_wp_user_id(self, wp_user_id: int) -> dict[str, Any] | None:
+        return self.get_user(self.by_wp_user_id, int(wp_user_id))
+
+    def create_user(self, username: str, attributes: list[dict], **kwargs) -> dict:
+        response = call_with_backoff(
+            get_cognito_client().admin_create_user,
+            UserPoolId=self.pool_id,
+            Username=username,
+            UserAttributes=attributes,
+            **kwargs,
+        )
+
+        with self.lock:
+            if self.loaded and "User" in response:
+                self.add(response["User"])
+
+        return response
+
+    def update_user_attributes(self, username: str, attributes: list[dict]) -> dict:
+        response = call_with_backoff(
+            get_cognito_client().admin_update_user_attributes,
+            UserPoolId=self.pool_id,
+            Username=username,
+            UserAttributes=attributes,
+        )
+
+        with self.lock:
+            resolved = self.resolve(username) if self.loaded else None
+            if resolved is not None:
+                user = copy.deepcopy(self.users[resolved])
+                merged = attributes_to_dict(user.get("Attributes", []))
+                merged.update(attributes_to_dict(attributes))
+                user["Attributes"] = [
+                    {"Name": name, "Value": value} for name, value in merged.items()
+                ]
+
+                self.remove(resolved)
+                self.add(user)
+
+        return response
+
+    def update_many(
+        self,
+        updates: list[tuple[str, list[dict]]],
+        max_workers: int = DEFAULT_WRITE_WORKERS,
+    ) -> list[Exception | None]:
+        """
+        Apply (username, attributes) updates concurrently. Returns, per update,
+        the exception it failed with, or None.
+        """
+
+        def update(entry: tuple[str, list[dict]]) -> Exception | None:
+            try:
+                self.update_user_attributes(*entry)
+            except Exception as e:
+                return e
+            return None
+
+        if not updates:
+            return []
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(updates)))) as executor:
+            return list(executor.map(update, updates))
+
+    def delete_user(self, username: str) -> dict:
+        response = call_with_backoff(
+            get_cognito_client().admin_delete_user,
+            UserPoolId=self.pool_id,
+            Username=username,
+        )
+
+        with self.lock:
+            resolved = self.resolve(username) if self.loaded else None
+            if resolved is not None:
+                self.remove(resolved)
+
+        return response
+
+
+cognito_directory = CognitoDirectory()
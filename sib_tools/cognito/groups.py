@@ -1,31 +1,49 @@
-import boto3
-from time import sleep
+import copy
 import json
 import logging
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from .list_users import (
     list_all_cognito_users,
     cognito_user_to_canonical,
     canonical_to_cognito_user,
-    cognito_client,
+    get_cognito_client,
     user_pool_id,
 )
+from .client import call_with_backoff
+
+# Maximum page size of ListGroups and ListUsersInGroup
+PAGE_LIMIT = 60
+
+# How many groups to fetch the members of at the same time
+DEFAULT_GROUP_WORKERS = 4
+
+# Members per group name, shared by both directions of the group sync.
+# Groups are dropped from it when their members are changed through this
+# module, so they are fetched again when needed.
+group_members_cache: dict[str, list[dict]] = {}
+group_members_lock = threading.Lock()
 
 
 def cognito_list_groups():
-    response = cognito_client.list_groups(
+    client = get_cognito_client()
+    response = call_with_backoff(
+        client.list_groups,
         UserPoolId=user_pool_id,
+        Limit=PAGE_LIMIT,
     )
 
     groups = response.get("Groups", [])
     while "NextToken" in response:
-        response = cognito_client.list_groups(
+        response = call_with_backoff(
+            client.list_groups,
             UserPoolId=user_pool_id,
+            Limit=PAGE_LIMIT,
             NextToken=response["NextToken"],
         )
         groups.extend(response.get("Groups", []))
-        sleep(0.1)
 
     return groups
 
@@ -34,22 +52,98 @@ def cognito_list_users_in_group_canonical(group_name):
     return [cognito_user_to_canonical(user) for user in users]
 
 def cognito_list_users_in_group(group_name):
-    response = cognito_client.list_users_in_group(
+    client = get_cognito_client()
+    response = call_with_backoff(
+        client.list_users_in_group,
         UserPoolId=user_pool_id,
         GroupName=group_name,
+        Limit=PAGE_LIMIT,
     )
 
     users = response.get("Users", [])
     while "NextToken" in response:
-        response = cognito_client.list_users_in_group(
+        response = call_with_backoff(
+            client.list_users_in_group,
             UserPoolId=user_pool_id,
             GroupName=group_name,
-            PaginationToken=response["NextToken"],
+            Limit=PAGE_LIMIT,
+            NextToken=response["NextToken"],
         )
         users.extend(response.get("Users", []))
-        sleep(0.1)
 
     return users
 
 
+def load_group_members(
+    group_names: list[str],
+    max_workers: int = DEFAULT_GROUP_WORKERS,
+    refresh: bool = False,
+) -> dict[str, list[dict]]:
+    """
+    Returns the (raw) members of each of the given groups. Groups that were not
+    loaded before in this process are fetched concurrently, with at most
+    max_workers requests in flight.
+    """
+    with group_members_lock:
+        missing = [
+            name for name in dict.fromkeys(group_names)
+            if refresh or name not in group_members_cache
+        ]
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as executor:
+            fetched = dict(zip(missing, executor.map(cognito_list_users_in_group, missing)))
+
+        with group_members_lock:
+            group_members_cache.update(fetched)
+
+    with group_members_lock:
+        # Copies, as cognito_user_to_canonical modifies the users it gets
+        return {
+            name: copy.deepcopy(group_members_cache[name])
+            for name in group_names
+            if name in group_members_cache
+        }
 
+
+def invalidate_group_members(group_name: str | None = None):
+    with group_members_lock:
+        if group_name is None:
+            group_members_cache.clear()
+        else:
+            group_members_cache.pop(group_name, None)
+
+
+def create_group(group_name: str) -> dict:
+    ans = call_with_backoff(
+        get_cognito_client().create_group,
+        GroupName=group_name,
+        UserPoolId=user_pool_id,
+    )
+
+    with group_members_lock:
+        group_members_cache[group_name] = []
+
+    return ans
+
+
+def add_user_to_group(username: str, group_name: str) -> dict:
+    res = call_with_backoff(
+        get_cognito_client().admin_add_user_to_group,
+        UserPoolId=user_pool_id,
+        Username=username,
+        GroupName=group_name,
+    )
+    invalidate_group_members(group_name)
+    return res
+
+
+def remove_user_from_group(username: str, group_name: str) -> dict:
+    res = call_with_backoff(
+        get_cognito_client().admin_remove_user_from_group,
+        UserPoolId=user_pool_id,
+        Username=username,
+        GroupName=group_name,
+    )
+    invalidate_group_members(group_name)
+    return res
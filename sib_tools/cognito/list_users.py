@@ -1,5 +1,3 @@
-import boto3
-from time import sleep
 import json
 import logging
 import sys
@@ -8,27 +6,12 @@ from ..canonical import canonical_key
 from ..canonical.canonical_key import flatten_dict
 from .constants import user_pool_id
 from .auth import get_cognito_credentials
-from typing import Any
-from .client import cognito_client
-
-cognito_to_canonical_dict = canonical_key.get_cognito_to_key()
+from typing import Any, Mapping
+from .client import get_cognito_client
+from .directory import cognito_directory
 
 def cognito_user_meta_to_canonical(user):
-    to_canonical = cognito_to_canonical_dict
-
-    flattened_user = flatten_dict(user)
-    canonical = dict()
-    for key, value in flattened_user.items():
-        new_key = to_canonical.get(key, None)
-
-        if new_key is not None:
-            canonical[new_key] = value
-            continue
-
-        other = canonical.setdefault("other", dict())
-        other[key] = value
-
-    return canonical
+    return canonical_key.get_schema().to_canonical("Cognito", user)
 
 
 def cognito_user_to_canonical(user : dict[str, Any]) -> dict[str, Any]:
@@ -53,59 +36,46 @@ def cognito_user_to_canonical(user : dict[str, Any]) -> dict[str, Any]:
     return cleaned_user
 
 
-def canonical_to_cognito_user(user):
-    to_cognito = canonical_key.get_key_to_cognito()
-
-    flattened_user = flatten_dict(user)
-    attributes = []
-    for key, value in flattened_user.items():
+def canonical_to_cognito_attributes(
+    user: dict[str, Any], to_cognito: Mapping[str, str]
+) -> dict[str, Any]:
+    """
+    Returns the Cognito attributes of a canonical user, by attribute name.
+    to_cognito is the canonical key to Cognito attribute mapping, so callers
+    converting many users can look it up once.
+    """
+    attributes = dict()
+    for key, value in flatten_dict(user).items():
         new_key = to_cognito.get(key, None)
 
         if key == "email_verified":
             new_key = new_key or "email_verified"
 
-        if new_key is None:
-            # logging.warning(f"[canonical_to_cognito_user] Key {key} not found in Cognito mapping, skipping.")
+        if new_key is None or value is None:
             continue
 
-        if value is None:
-            continue
+        attributes[new_key] = value
+
+    return attributes
 
-        attributes.append({"Name": new_key, "Value": value})
 
-        # other = user.setdefault("other", dict())
-        # other[key] = value
+def canonical_to_cognito_user(user):
+    to_cognito = canonical_key.get_schema().from_key["Cognito"]
+    attributes = canonical_to_cognito_attributes(user, to_cognito)
 
     return {
         "Username": user.get("cognito_sub") or user.get("email"),
-        "Attributes": attributes,
+        "Attributes": [{"Name": k, "Value": v} for k, v in attributes.items()],
     }
 
 
 def list_cognito_users_canonical():
-    cognito_users = list_all_cognito_users()
-    return [cognito_user_to_canonical(user) for user in cognito_users]
+    return cognito_directory.list_users_canonical()
 
 
 def list_all_cognito_users():
-    cognito_users = []
-
-    response = cognito_client.list_users(
-        UserPoolId=user_pool_id,
-        Limit=10,
-    )
-
-    while True:
-        cognito_users.extend(response["Users"])
-
-        paginationToken = response.get("PaginationToken")
-        if paginationToken is None:
-            break
-
-        response = cognito_client.list_users(
-            UserPoolId=user_pool_id,
-            PaginationToken=paginationToken,
-        )
-        sleep(0.1)
-
-    return cognito_users
+    """
+    Returns all users of the pool. The pool is only listed once per process,
+    see CognitoDirectory.
+    """
+    return cognito_directory.list_users()
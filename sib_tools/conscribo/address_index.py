@@ -0,0 +1,194 @@
+"""
+Local index of the PDOK addresses per postal code, for the address check.
+
+The index is a SQLite file with the street and place names of every known
+postal code, and its addresses keyed by postal code and house number. It is
+filled from the PDOK response cache with build_from_pdok_cache(), and
+every postal code fetched from PDOK afterwards is added to it. Lookups are a
+single indexed query, so only postal codes that are not in the index need a
+request to PDOK.
+
+Addresses change, so a postal code expires MAX_AGE_DAYS after it was indexed,
+and is then requested from PDOK again. Postal codes PDOK returned nothing for
+are not indexed, so they are retried too.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .check_address import AddressOuput
+
+INDEX_PATH = os.path.expanduser("~/.sib_pdok_address_index.sqlite")
+PDOK_CACHE_DIR = os.path.expanduser("~/.sib_pdok_cache")
+
+MAX_AGE_DAYS = 30
+
+# One connection per thread and index path, as sqlite3 connections may not be
+# shared between threads.
+connections = threading.local()
+
+
+def open_index(path: str = INDEX_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS postal_codes (
+            postal_code TEXT PRIMARY KEY,
+            street_names TEXT NOT NULL,
+            place_names TEXT NOT NULL,
+            indexed_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS addresses (
+            postal_code TEXT NOT NULL,
+            house_number TEXT,
+            number TEXT,
+            street_name TEXT,
+            place_name TEXT,
+            rdf TEXT
+        );
+        CREATE INDEX IF NOT EXISTS addresses_key ON addresses (postal_code, house_number);
+        """
+    )
+    return conn
+
+
+def get_connection(path: str = INDEX_PATH) -> sqlite3.Connection:
+    conns = getattr(connections, "by_path", None)
+    if conns is None:
+        conns = connections.by_path = {}
+
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = open_index(path)
+    return conn
+
+
+def oldest_valid() -> str:
+    return (datetime.now() - timedelta(days=MAX_AGE_DAYS)).isoformat()
+
+
+def is_expired(postal_code: str, path: str = INDEX_PATH) -> bool:
+    """
+    Whether the postal code was indexed more than MAX_AGE_DAYS ago.
+    """
+    row = get_connection(path).execute(
+        "SELECT indexed_at FROM postal_codes WHERE postal_code = ?", (postal_code,)
+    ).fetchone()
+    return row is not None and row[0] < oldest_valid()
+
+
+def lookup(postal_code: str, path: str = INDEX_PATH) -> "AddressOuput | None":
+    """
+    Returns the indexed addresses of the postal code, or None if it is not in
+    the index or has expired.
+    """
+    from .check_address import AddressOuput
+
+    conn = get_connection(path)
+    row = conn.execute(
+        "SELECT street_names, place_names FROM postal_codes "
+        "WHERE postal_code = ? AND indexed_at >= ?",
+        (postal_code, oldest_valid()),
+    ).fetchone()
+    if row is None:
+        return None
+
+    addresses = [
+        {
+            "number": number,
+            "house_number": house_number,
+            "place_name": place_name,
+            "street_name": street_name,
+            "rdf": rdf,
+            "details": rdf,
+        }
+        for house_number, number, street_name, place_name, rdf in conn.execute(
+            "SELECT house_number, number, street_name, place_name, rdf "
+            "FROM addresses WHERE postal_code = ? ORDER BY rowid",
+            (postal_code,),
+        )
+    ]
+
+    return AddressOuput(
+        postal_code=postal_code,
+        street_names=json.loads(row[0]),
+        place_names=json.loads(row[1]),
+        addresses=addresses,
+    )
+
+
+def store(output: "AddressOuput", path: str = INDEX_PATH, commit: bool = True):
+    conn = get_connection(path)
+    conn.execute("DELETE FROM addresses WHERE postal_code = ?", (output.postal_code,))
+    conn.execute(
+        "INSERT OR REPLACE INTO postal_codes "
+        "(postal_code, street_names, place_names, indexed_at) VALUES (?, ?, ?, ?)",
+        (
+            output.postal_code,
+            json.dumps(output.street_names),
+            json.dumps(output.place_names),
+            datetime.now().isoformat(),
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO addresses "
+        "(postal_code, house_number, number, street_name, place_name, rdf) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (
+                output.postal_code,
+                address["house_number"],
+                address["number"],
+                address["street_name"],
+                address["place_name"],
+                address["rdf"],
+            )
+            for address in output.addresses
+        ],
+    )
+    if commit:
+        conn.commit()
+
+
+def build_from_pdok_cache(
+    cache_dir: str = PDOK_CACHE_DIR, path: str = INDEX_PATH
+) -> dict[str, int]:
+    """
+    Add every postal code in the PDOK response cache to the index.
+    """
+    from .check_address import parse_pdok_docs
+    from .file_cache import get_cache_for_dir
+
+    counts = {"responses": 0, "postal_codes": 0, "addresses": 0}
+    conn = get_connection(path)
+    for key, data in get_cache_for_dir(cache_dir).items():
+        # Keys are <postal code>_<url hash>.json
+        postal_code = key.split("_", 1)[0]
+        counts["responses"] += 1
+        if len(postal_code) != 6:
+            continue
+
+        docs = data.get("response", {}).get("docs", [])
+        if not docs:
+            continue
+
+        output = parse_pdok_docs(postal_code, docs)
+        store(output, path, commit=False)
+        counts["postal_codes"] += 1
+        counts["addresses"] += len(output.addresses)
+
+    conn.commit()
+    return counts
+
+
+def index_stats(path: str = INDEX_PATH) -> dict[str, int]:
+    conn = get_connection(path)
+    return {
+        "postal_codes": conn.execute("SELECT COUNT(*) FROM postal_codes").fetchone()[0],
+        "addresses": conn.execute("SELECT COUNT(*) FROM addresses").fetchone()[0],
+    }
@@ -1,28 +1,29 @@
 import os
+import re
 from dotenv import load_dotenv
 load_dotenv()
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import keyring
 import keyring.errors
+import threading
 from datetime import datetime, timedelta
 from getpass import getpass
-from typing import Mapping
+from time import sleep
+from typing import Any, Mapping
 
-from traitlets import Any
-from .constants import api_url, username
+from .constants import api_url, api_version, username
 
 
-session_id: str | None = None
-session_id_expiration = None
-
 # Add logging for Conscribo
 import logging
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-handler = logging.FileHandler("conscribo_api.log")
+# Only create the log file once something is actually logged
+handler = logging.FileHandler("conscribo_api.log", delay=True)
 handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s: %(message)s"))
 logger.addHandler(handler)
 
@@ -39,29 +40,146 @@ class ApiRequestError(Exception):
         self.status_code = status_code
 
 
-def prompt_credentials():
-    password = getpass(f"Password for {username}: ")
-    keyring.set_password("sib-conscribo", "member-admin-bot", password)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "PATCH"}
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ConscriboClient:
+    """
+    Shared HTTP client for the Conscribo API.
+
+    All calls go through one pooled :class:`requests.Session`, so consecutive
+    calls reuse the TCP/TLS connection instead of doing a new handshake for
+    every request. Rate limiting (429) is retried for every method, server
+    errors (5xx) and connection errors only for idempotent methods, so a
+    create is never sent twice.
+    """
+
+    def __init__(
+        self,
+        base_url: str = api_url,
+        pool_size: int = 10,
+        timeout: float | tuple[float, float] = (10, 60),
+        max_retries: int = 4,
+        backoff_factor: float = 1.0,
+    ):
+        self.base_url = base_url.removesuffix("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"X-Conscribo-API-Version": api_version})
+
+    def get_retry_delay(self, attempt: int, response: requests.Response | None = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+
+        return self.backoff_factor * (2 ** attempt)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        session_id: str | None = None,
+        idempotent: bool | None = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Do a request to the Conscribo API, retrying with backoff when
+        appropriate. Returns the last response, also if it is not ok.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if session_id is not None:
+            headers["X-Conscribo-SessionId"] = session_id
+
+        kwargs.setdefault("timeout", self.timeout)
+        full_url = f"{self.base_url}/{url.removeprefix('/')}"
+
+        attempt = 0
+        while True:
+            try:
+                res = self.session.request(method, full_url, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+
+                delay = self.get_retry_delay(attempt)
+                logger.warning(f"{method} {url} failed ({e}), retrying in {delay:.1f}s")
+            else:
+                retryable = res.status_code in RETRY_STATUS_CODES and (
+                    idempotent or res.status_code == 429
+                )
+                if not retryable or attempt >= self.max_retries:
+                    return res
+
+                delay = self.get_retry_delay(attempt, res)
+                logger.warning(
+                    f"{method} {url} returned {res.status_code}, retrying in {delay:.1f}s"
+                )
+
+            sleep(delay)
+            attempt += 1
+
+
+conscribo_client: ConscriboClient | None = None
+conscribo_client_lock = threading.Lock()
+
+
+def get_conscribo_client() -> ConscriboClient:
+    """
+    Returns the process-wide Conscribo client, creating it on first use.
+    """
+    global conscribo_client
+
+    if conscribo_client is None:
+        with conscribo_client_lock:
+            if conscribo_client is None:
+                conscribo_client = ConscriboClient()
+
+    return conscribo_client
+
+
+def configure_conscribo_client(**kwargs) -> ConscriboClient:
+    """
+    Replace the process-wide Conscribo client, for example to change the pool
+    size or timeouts. Accepts the keyword arguments of ConscriboClient.
+    """
+    global conscribo_client
+
+    with conscribo_client_lock:
+        conscribo_client = ConscriboClient(**kwargs)
 
+    return conscribo_client
 
-"""
 
-Returns the session id of the authenticated user.
-"""
+def prompt_credentials():
+    password = getpass(f"Password for {username}: ")
+    keyring.set_password("sib-conscribo", "member-admin-bot", password)
 
 
 def validate_session(session_id: str) -> bool | int:
     """
     Checks if the session is still valid by calling /sessions/.
-    Returns True if valid, False otherwise.
+    Returns the number of seconds until the session is logged out if valid,
+    False otherwise.
     """
     try:
-        res = requests.get(
-            f"{api_url}/sessions/",
-            headers={
-                "X-Conscribo-SessionId": session_id,
-                "X-Conscribo-API-Version": "1.20240610",
-            },
+        res = get_conscribo_client().request(
+            "GET",
+            "/sessions/",
+            session_id=session_id,
         )
         if res.status_code == 400:
             logger.info("Session invalid (400), need to re-authenticate.")
@@ -80,7 +198,10 @@ def validate_session(session_id: str) -> bool | int:
 
 
 def authenticate() -> str:
-    global session_id, session_id_expiration
+    """
+    Signs in with the bot credentials and returns the new session id. The
+    session id is also cached in the keyring.
+    """
     # Try environment variable first
     password = os.environ.get("CONSCRIBO_PASSWORD")
     user = os.environ.get("CONSCRIBO_USERNAME", username)
@@ -94,11 +215,9 @@ def authenticate() -> str:
 
     logger.debug(f"Password length: {len(password)}")
 
-    auth_session_response = requests.post(
-        f"{api_url}/sessions/",
-        headers={
-            "X-Conscribo-API-Version": "1.20240610",
-        },
+    auth_session_response = get_conscribo_client().request(
+        "POST",
+        "/sessions/",
         json={
             "userName": user,
             "passPhrase": password,
@@ -121,59 +240,234 @@ def authenticate() -> str:
 
     user_display_name = auth_session["userDisplayName"]
     auth_session_id : str = auth_session["sessionId"]
-    session_id = auth_session_id
     # Cache session id in keyring
-    keyring.set_password("sib-conscribo", "session-id", session_id)
+    keyring.set_password("sib-conscribo", "session-id", auth_session_id)
+
+    return auth_session_id
+
+
+class ConscriboSessionManager:
+    """
+    Keeps the Conscribo session id and the moment it expires.
+
+    Conscribo logs a session out after ``session_timeout`` of inactivity, and
+    /sessions/ reports the time left as ``secsToLogout``. The manager uses that
+    value as the expiry of a session it adopts, and slides the expiry forward
+    by session_timeout on every successful call, so the session only has to be
+    validated again when it actually runs out. With ``background_refresh``, a
+    timer validates the session shortly before it expires, so long-running
+    processes (like the SNS listener) normally never wait for the validation
+    round-trip. If that validation fails, the timer stops, and the next call
+    logs in again.
+    """
+
+    def __init__(
+        self,
+        refresh_margin: timedelta = timedelta(seconds=60),
+        session_timeout: timedelta = timedelta(minutes=5),
+        background_refresh: bool = True,
+    ):
+        self.refresh_margin = refresh_margin
+        self.session_timeout = session_timeout
+        self.background_refresh = background_refresh
+
+        self.lock = threading.RLock()
+        self.session_id: str | None = None
+        self.expiration: datetime | None = None
+        self.refresh_timer: threading.Timer | None = None
+
+    def is_fresh(self) -> bool:
+        return (
+            self.session_id is not None
+            and self.expiration is not None
+            and datetime.now() < self.expiration - self.refresh_margin
+        )
+
+    def get_session_id(self) -> str:
+        with self.lock:
+            if self.is_fresh():
+                assert self.session_id is not None
+                return self.session_id
+
+            return self.refresh()
+
+    def set_session(self, session_id: str, secs_to_logout: int | None = None):
+        """
+        Use the session, which expires after secs_to_logout (the time left, as
+        reported by /sessions/), or after session_timeout if it is new.
+        """
+        with self.lock:
+            self.session_id = session_id
+
+            time_left = (
+                self.session_timeout
+                if secs_to_logout is None
+                else timedelta(seconds=secs_to_logout)
+            )
+            self.expiration = datetime.now() + time_left
+            self.schedule_refresh()
+
+    def touch(self, session_id: str):
+        """
+        Register a successful call, which resets the inactivity timeout.
+        """
+        with self.lock:
+            if session_id != self.session_id or self.expiration is None:
+                return
+
+            self.expiration = max(self.expiration, datetime.now() + self.session_timeout)
+
+    def invalidate(self, session_id: str | None = None):
+        """
+        Forget the session, for example after the API rejected it. If
+        session_id is given, only forget it if it is still the current one.
+        """
+        with self.lock:
+            if session_id is not None and session_id != self.session_id:
+                return
+
+            self.session_id = None
+            self.expiration = None
+
+    def refresh(self, force_authenticate: bool = False) -> str:
+        with self.lock:
+            cached_session_id = None
+            if not force_authenticate:
+                # Try to get session id from keyring
+                cached_session_id = self.session_id or keyring.get_password(
+                    "sib-conscribo", "session-id"
+                )
+                logger.info(f"Cached session id present: {cached_session_id is not None}")
+
+            if cached_session_id:
+                secsToLogout = validate_session(cached_session_id) or 0
+
+                # A session about to expire would have to be validated again
+                # on the next call, so log in again instead.
+                if secsToLogout > self.refresh_margin.total_seconds():
+                    logger.info("Using cached session id.")
+                    self.set_session(cached_session_id, secsToLogout)
+                    return cached_session_id
+
+                logger.info("Cached session id invalid, re-authenticating.")
+
+            # Authenticate and cache new session id
+            new_session_id = authenticate()
+            self.set_session(new_session_id)
+            return new_session_id
+
+    def schedule_refresh(self):
+        if not self.background_refresh or self.expiration is None:
+            return
+
+        if self.refresh_timer is not None:
+            self.refresh_timer.cancel()
+
+        delay = (self.expiration - self.refresh_margin * 2 - datetime.now()).total_seconds()
+        self.refresh_timer = threading.Timer(
+            max(delay, self.refresh_margin.total_seconds()), self.refresh_in_background
+        )
+        self.refresh_timer.daemon = True
+        self.refresh_timer.start()
 
-    session_id_expiration = datetime.now() + timedelta(minutes=5)
-    return session_id
+    def refresh_in_background(self):
+        with self.lock:
+            if self.session_id is None:
+                return
+
+            if self.is_fresh() and self.expiration is not None and (
+                self.expiration - datetime.now() > self.refresh_margin * 3
+            ):
+                # Calls in the meantime have extended the session
+                self.schedule_refresh()
+                return
+
+            # Only validate: logging in again may need to ask for the
+            # password, so that is left to the next call.
+            logger.debug("Refreshing Conscribo session in the background.")
+            session_id = self.session_id
+            secs_to_logout = validate_session(session_id) or 0
+            if secs_to_logout > self.refresh_margin.total_seconds():
+                self.set_session(session_id, secs_to_logout)
+            else:
+                logger.info("Conscribo session expired, not refreshing it in the background.")
+                self.invalidate(session_id)
+
+
+session_manager = ConscriboSessionManager()
 
 
 def do_auth():
-    authenticate()
-    if session_id is None:
+    session_manager.refresh(force_authenticate=True)
+    if session_manager.session_id is None:
         logger.error("Session id is None after authentication")
         raise Exception("Session id is None after authentication")
 
-    logger.debug(f"Session id length: {len(session_id)}")
+    logger.debug(f"Session id length: {len(session_manager.session_id)}")
 
 
 def get_conscribo_session_id():
-    global session_id, session_id_expiration
+    return session_manager.get_session_id()
 
-    if (
-        session_id is not None and
-        session_id_expiration is not None and
-        datetime.now() < session_id_expiration
-    ):
-        return session_id
-    # Try to get session id from keyring
-    cached_session_id = session_id or keyring.get_password("sib-conscribo", "session-id")
-    logger.info(f"Cached session id present: {cached_session_id is not None}")
-    if cached_session_id:
-        secsToLogout = validate_session(cached_session_id) or 0
-
-        if secsToLogout > 0:
-            session_id = cached_session_id
-            logger.info("Using cached session id.")
-            return session_id
-        else:
-            logger.info("Cached session id invalid, re-authenticating.")
-    # Authenticate and cache new session id
-    session_id = authenticate()
-    return session_id
 
+# Error codes and messages Conscribo uses for a session that expired or is
+# unknown. Other 400/403 responses (validation, permissions) are not retried.
+SESSION_ERROR_CODES = {"notAuthenticated", "sessionExpired", "invalidSession"}
+SESSION_ERROR_MESSAGE = re.compile(
+    r"session\W*(id\W*)?(has\s+)?(expired|is\s+(not\s+valid|invalid|unknown)|not\s+found)"
+    r"|not\s+(logged\s+in|authenticated)",
+    re.IGNORECASE,
+)
+
+
+def is_invalid_session_response(res: requests.Response) -> bool:
+    if res.status_code == 401:
+        return True
+
+    if res.status_code not in (400, 403):
+        return False
+
+    try:
+        body = res.json()
+    except ValueError:
+        return False
+
+    messages = (body.get("responseMessages") or {}) if isinstance(body, dict) else {}
+    for message in messages.get("error") or []:
+        if not isinstance(message, dict):
+            continue
+        if message.get("code") in SESSION_ERROR_CODES:
+            return True
+        if SESSION_ERROR_MESSAGE.search(str(message.get("message") or "")):
+            return True
+
+    return False
+
+
+def conscribo_request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Do an authenticated request. If Conscribo rejects the session, signs in
+    again and retries once.
+    """
+    client = get_conscribo_client()
 
-def conscribo_get(url: str) -> dict:
     session_id = get_conscribo_session_id()
+    res = client.request(method, url, session_id=session_id, **kwargs)
 
-    res = requests.get(
-        f"{api_url}/{url.removeprefix('/')}",
-        headers={
-            "X-Conscribo-SessionId": session_id,
-            "X-Conscribo-API-Version": "1.20240610",
-        },
-    )
+    if is_invalid_session_response(res):
+        logger.info(f"Session rejected for {method.upper()} {url}, re-authenticating.")
+        session_manager.invalidate(session_id)
+        session_id = session_manager.refresh(force_authenticate=True)
+        res = client.request(method, url, session_id=session_id, **kwargs)
+
+    if res.ok:
+        session_manager.touch(session_id)
+
+    return res
+
+
+def conscribo_get(url: str) -> dict:
+    res = conscribo_request("GET", url)
 
     if not res.ok:
         raise ApiRequestError(f"Failed to get {url}: {res.text}", status_code=res.status_code)
@@ -181,14 +475,9 @@ def conscribo_get(url: str) -> dict:
     return res.json()
 
 def conscribo_delete(url: str, params : None | Mapping[str, Any]) -> dict:
-    session_id = get_conscribo_session_id()
-
-    res = requests.delete(
-        f"{api_url}/{url.removeprefix('/')}",
-        headers={
-            "X-Conscribo-SessionId": session_id,
-            "X-Conscribo-API-Version": "1.20240610",
-        },
+    res = conscribo_request(
+        "DELETE",
+        url,
         params=params, # type: ignore
     )
 
@@ -198,16 +487,7 @@ def conscribo_delete(url: str, params : None | Mapping[str, Any]) -> dict:
     return res.json()
 
 def conscribo_post(url : str, json : dict) -> dict:
-    session_id = get_conscribo_session_id()
-
-    res = requests.post(
-        f"{api_url}/{url.removeprefix('/')}",
-        headers={
-            "X-Conscribo-SessionId": session_id,
-            "X-Conscribo-API-Version": "1.20240610",
-        },
-        json=json,
-    )
+    res = conscribo_request("POST", url, json=json)
     
     if not res.ok:
         raise ApiRequestError(f"Failed to post to {url}: {res.text}", status_code=res.status_code)
@@ -216,16 +496,7 @@ def conscribo_post(url : str, json : dict) -> dict:
 
 
 def conscribo_patch(url : str, json : dict) -> dict:
-    session_id = get_conscribo_session_id()
-
-    return requests.patch(
-        f"{api_url}/{url.removeprefix('/')}",
-        headers={
-            "X-Conscribo-SessionId": session_id,
-            "X-Conscribo-API-Version": "1.20240610",
-        },
-        json=json,
-    ).json()
+    return conscribo_request("PATCH", url, json=json).json()
 
 
 def check_available():
@@ -1,10 +1,9 @@
-from time import sleep
 import logging
+import time
 import sys
 import re
 import requests
 import os
-import json
 import hashlib
 from typing import TYPE_CHECKING
 
@@ -15,11 +14,26 @@ from . import groups
 from .check_numbering import check_relation_number_correct
 from dataclasses import dataclass
 from .check_numbering import is_external_number
-from .file_cache import file_cache, make_cache_key
+from .file_cache import file_cache, make_cache_key, store_in_cache, is_cached
+from . import address_index
+from ..rate_limit import TokenBucket
+from concurrent.futures import ThreadPoolExecutor
 
 if TYPE_CHECKING:
     from logging import Logger
 
+PDOK_CACHE_DIR = os.path.expanduser("~/.sib_pdok_cache")
+
+# Request budget for the PDOK locatieserver, which asks for fair use but
+# publishes no fixed limit.
+PDOK_REQUESTS_PER_SECOND = 4.0
+PDOK_REQUEST_BURST = 4
+PDOK_PREFETCH_WORKERS = 4
+# Attempts per postal code when PDOK answers 429 Too Many Requests
+PDOK_MAX_ATTEMPTS = 5
+
+pdok_rate_limiter = TokenBucket(PDOK_REQUESTS_PER_SECOND, capacity=PDOK_REQUEST_BURST)
+
 
 @dataclass
 class AddressOuput:
@@ -27,6 +41,8 @@ class AddressOuput:
     street_names: list[str]
     place_names: list[str]
     addresses: list[dict]
+    # Set if PDOK could not be reached, so nothing is known about the address
+    fetch_failed: bool = False
 
 
 def format_house_number(number, addition, house_letter, house_number):
@@ -60,9 +76,43 @@ def format_house_number(number, addition, house_letter, house_number):
     return house_number
 
 
+def pdok_url(postal_code: str) -> str:
+    return f"https://api.pdok.nl/bzk/locatieserver/search/v3_1/free?q={postal_code}&rows=100&df=postcode"
+
+
+def fetch_pdok(url: str) -> dict:
+    """
+    Request url from PDOK within the rate limit, retrying when PDOK answers
+    429 Too Many Requests.
+    """
+    attempt = 1
+    while True:
+        pdok_rate_limiter.acquire()
+        response = requests.get(url)
+        if response.status_code != 429 or attempt >= PDOK_MAX_ATTEMPTS:
+            break
+
+        pdok_rate_limiter.slow_down(float(response.headers.get("Retry-After") or 1))
+        attempt += 1
+
+    response.raise_for_status()
+    pdok_rate_limiter.succeeded()
+    return response.json()
+
+
+def is_postal_code_cached(postal_code: str) -> bool:
+    postal_code = postal_code.replace(" ", "")
+    if address_index.lookup(postal_code) is not None:
+        return True
+    return not address_index.is_expired(postal_code) and is_cached(
+        PDOK_CACHE_DIR, make_cache_key(pdok_url(postal_code), postal_code=postal_code)
+    )
+
+
 def get_for_postal_code(postal_code) -> AddressOuput:
     """
-    Get address information for a postal code from the Dutch PDOK API.
+    Get address information for a postal code, from the local address index
+    or else from the Dutch PDOK API.
 
     Args:
         postal_code: Dutch postal code (postcode)
@@ -74,25 +124,24 @@ def get_for_postal_code(postal_code) -> AddressOuput:
     docs = []
 
     if len(postal_code) == 6:
-        url = f"https://api.pdok.nl/bzk/locatieserver/search/v3_1/free?q={postal_code}&rows=100&df=postcode"
-        cache_dir = os.path.expanduser("~/.sib_pdok_cache")
+        indexed = address_index.lookup(postal_code)
+        if indexed is not None:
+            return indexed
+
+        url = pdok_url(postal_code)
+        cache_dir = PDOK_CACHE_DIR
         cache_key = make_cache_key(url, postal_code=postal_code)
         with file_cache(cache_dir, cache_key) as cached:
-            if cached is not None:
+            # The cached response is as old as the expired index entry
+            if cached is not None and not address_index.is_expired(postal_code):
                 data = cached
             else:
                 try:
                     logging.debug(
                         f"Fetching postal code data for {postal_code} from PDOK API"
                     )
-                    response = requests.get(url)
-                    response.raise_for_status()
-                    data = response.json()
-                    with open(
-                        os.path.join(cache_dir, cache_key), "w", encoding="utf-8"
-                    ) as f:
-                        json.dump(data, f)
-                    sleep(1)  # Rate limiting
+                    data = fetch_pdok(url)
+                    store_in_cache(cache_dir, cache_key, data)
                 except requests.exceptions.RequestException as e:
                     logging.error(f"Error fetching postal code data: {e}")
                     return AddressOuput(
@@ -100,9 +149,22 @@ def get_for_postal_code(postal_code) -> AddressOuput:
                         street_names=[],
                         place_names=[],
                         addresses=[],
+                        fetch_failed=True,
                     )
             docs = data.get("response", {}).get("docs", [])
 
+        output = parse_pdok_docs(postal_code, docs)
+        if docs:
+            address_index.store(output)
+        return output
+
+    return parse_pdok_docs(postal_code, docs)
+
+
+def parse_pdok_docs(postal_code: str, docs: list[dict]) -> AddressOuput:
+    """
+    Convert the documents of a PDOK locatieserver response to an AddressOuput.
+    """
     # Filter for postal code information
     postal_code_infos = [doc for doc in docs if doc.get("type") == "postcode"]
     place_names = sorted(
@@ -238,6 +300,13 @@ def check_address(
                 logger.warning(line)
         return True
     address_output = get_for_postal_code(postal_code)
+    if address_output.fetch_failed:
+        logger.warning(
+            f"Could not check the address of {selector_colored}: looking up "
+            f"postal code {postal_code} at PDOK failed."
+        )
+        logger.warning("")
+        return True
     if street_name not in address_output.street_names:
         msg = (
             format_problem_found("Invalid street name.") +
@@ -297,6 +366,38 @@ def check_address(
         logger.info("")
     # logger.debug(f"Address output for {selector}: {address_output}")
 
+def prefetch_postal_codes(
+    relations: list[dict], logger: 'Logger', workers: int = PDOK_PREFETCH_WORKERS
+):
+    """
+    Look up the distinct postal codes of the relations that are not cached
+    yet, concurrently within the PDOK rate limit, so check_address finds them
+    all in the cache.
+    """
+    postal_codes = sorted({
+        relation["postal_code"].replace(" ", "")
+        for relation in relations
+        if relation.get("postal_code")
+        and not is_external_number(relation["conscribo_id"])
+    })
+    # Only complete postal codes are looked up
+    postal_codes = [code for code in postal_codes if len(code) == 6]
+    missing = [code for code in postal_codes if not is_postal_code_cached(code)]
+
+    start = time.monotonic()
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing)))) as executor:
+            list(executor.map(get_for_postal_code, missing))
+    duration = time.monotonic() - start
+
+    hits = len(postal_codes) - len(missing)
+    ratio = hits / len(postal_codes) if postal_codes else 1.0
+    logger.info(
+        f"Postal codes: {len(postal_codes)} distinct, {hits} cached "
+        f"({ratio:.0%} hit ratio), {len(missing)} fetched from PDOK in {duration:.1f}s."
+    )
+
+
 def check_addresses(logger: 'Logger', include_alumni=True, include_members=True):
     logger.info("\x1b[94mPreparing...\x1b[0m")
     if include_members:
@@ -305,10 +406,16 @@ def check_addresses(logger: 'Logger', include_alumni=True, include_members=True)
         logger.info("")
     else:
         personen = []
+    if include_alumni:
+        alumni = list_relations_alumnus()
+        logger.info(f"Fetched {len(alumni)} alumni from Conscribo.")
+        logger.info("")
+    else:
+        alumni = []
+    prefetch_postal_codes(personen + alumni, logger)
     logger.info("\x1b[94mPreparation done.\x1b[0m")
     logger.info("")
     logger.info("\x1b[94mChecking addresses...\x1b[0m")
-    logger.info("  To not overuse the API, this will take a while.")
     if include_members:
         logger.info("Checking for members...")
         for relation in personen:
@@ -323,8 +430,6 @@ def check_addresses(logger: 'Logger', include_alumni=True, include_members=True)
         logger.info("")
     if include_alumni:
         logger.info("Checking for alumni...")
-        alumni = list_relations_alumnus()
-        logger.info(f"Fetched {len(alumni)} alumni from Conscribo.")    
         for relation in alumni:
             check_address(
                 relation,
@@ -1,4 +1,12 @@
 # Constants for conscribo module
 
 api_url = "https://api.secure.conscribo.nl/sib-utrecht"
+api_version = "1.20240610"
 username = "member-admin-bot"
+
+# Request budget for paging through financial transactions, and how many
+# pages are requested ahead of the one being processed.
+transactions_requests_per_second = 2.0
+transactions_request_burst = 2
+transactions_page_size = 100
+transactions_prefetch_pages = 3
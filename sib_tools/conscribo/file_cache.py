@@ -1,24 +1,78 @@
 import os
+import re
 import json
 import hashlib
-import time
+import threading
 from contextlib import contextmanager
 
+from ..file_cache import FileCache, get_cache
+
+# Names of the files make_cache_key() gave the entries of the old layout
+CACHE_FILE_NAME = re.compile(r"(\w+_)?[0-9a-f]{16}\.json")
+
+migrated_dirs: set[str] = set()
+migrate_lock = threading.Lock()
+
+
+def get_cache_for_dir(cache_dir) -> FileCache:
+    """
+    Returns the cache that replaces the JSON files formerly stored in
+    cache_dir. It lives beside it, as <cache_dir>.sqlite.
+    """
+    cache_dir = os.path.normpath(cache_dir)
+    cache = get_cache(cache_dir + ".sqlite")
+
+    with migrate_lock:
+        if cache_dir not in migrated_dirs:
+            migrate_json_files(cache_dir, cache)
+            migrated_dirs.add(cache_dir)
+
+    return cache
+
+
+def migrate_json_files(cache_dir, cache: FileCache):
+    """
+    Move the JSON files of the old one-file-per-key layout into the cache, in
+    a single transaction. Other files, and the directory itself, are left
+    alone.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+
+    values = []
+    migrated = []
+    for fname in os.listdir(cache_dir):
+        fpath = os.path.join(cache_dir, fname)
+        if not CACHE_FILE_NAME.fullmatch(fname) or not os.path.isfile(fpath):
+            continue
+
+        try:
+            with open(fpath, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            # Half-written files of the old layout are dropped
+            value = None
+
+        if value is not None:
+            values.append((fname, value))
+        migrated.append(fpath)
+
+    if not migrated:
+        return
+
+    cache.put_many(values)
+    for fpath in migrated:
+        os.remove(fpath)
+
 @contextmanager
 def file_cache(cache_dir, key):
-    os.makedirs(cache_dir, exist_ok=True)
-    cache_path = os.path.join(cache_dir, key)
-    try:
-        if os.path.exists(cache_path):
-            # Touch the file to update its modification time
-            now = time.time()
-            os.utime(cache_path, (now, now))
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                yield json.load(f)
-        else:
-            yield None
-    finally:
-        pass
+    yield get_cache_for_dir(cache_dir).get(key)
+
+def store_in_cache(cache_dir, key, value):
+    get_cache_for_dir(cache_dir).put(key, value)
+
+def is_cached(cache_dir, key) -> bool:
+    return key in get_cache_for_dir(cache_dir)
 
 def make_cache_key(url, postal_code=None):
     """
@@ -31,16 +85,6 @@ def make_cache_key(url, postal_code=None):
 
 def clear_old_caches(cache_dir, days_unused=30):
     """
-    Remove cache files in cache_dir not accessed in the last 'days_unused' days.
+    Remove cache entries not accessed in the last 'days_unused' days.
     """
-    now = time.time()
-    cutoff = now - days_unused * 86400
-    removed = []
-    for fname in os.listdir(cache_dir):
-        fpath = os.path.join(cache_dir, fname)
-        if os.path.isfile(fpath):
-            last_used = os.path.getmtime(fpath)
-            if last_used < cutoff:
-                os.remove(fpath)
-                removed.append(fname)
-    return removed
+    return get_cache_for_dir(cache_dir).remove_unused(days_unused)
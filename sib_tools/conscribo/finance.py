@@ -5,11 +5,25 @@ import keyring
 from getpass import getpass
 from ..canonical import canonical_key
 from ..canonical.canonical_key import flatten_dict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Iterator
 
-from .constants import api_url
+from ..rate_limit import TokenBucket
+from .constants import (
+    api_url,
+    transactions_page_size,
+    transactions_prefetch_pages,
+    transactions_request_burst,
+    transactions_requests_per_second,
+)
 from .auth import conscribo_post, conscribo_get, conscribo_patch
 
+transactions_rate_limiter = TokenBucket(
+    transactions_requests_per_second, capacity=transactions_request_burst
+)
+
 
 def list_conscribo_accounts(date: str | None = None):
     """
@@ -51,3 +65,79 @@ def list_conscribo_transactions(
         payload["limit"] = limit
 
     return conscribo_post("/financial/transactions/filters/", json=payload)
+
+
+def list_transactions_page(
+    start_date: str,
+    end_date: str,
+    account_id: str | None,
+    limit: int,
+    offset: int,
+) -> list[dict]:
+    transactions_rate_limiter.acquire()
+    transactions = list_conscribo_transactions(
+        start_date, end_date, account_id, limit=limit, offset=offset
+    ).get("transactions") or {}
+
+    # An empty result may come as a list instead of an object
+    if isinstance(transactions, dict):
+        return list(transactions.values())
+    return list(transactions)
+
+
+def iter_conscribo_transactions(
+    start_date: str,
+    end_date: str,
+    account_id: str | None = None,
+    offset: int = 0,
+    limit: int | None = None,
+    page_size: int = transactions_page_size,
+    prefetch: int = transactions_prefetch_pages,
+) -> Iterator[dict]:
+    """
+    Yield the Conscribo transactions for a given date range and account ID,
+    one at a time. While a page is being processed, up to `prefetch` next
+    pages are already requested, within the transactions rate limit.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, prefetch))
+    pending = deque()
+    next_offset = offset
+    end_offset = offset + limit if limit is not None else None
+    done = False
+
+    def request_pages():
+        nonlocal next_offset
+        while (
+            not done
+            and len(pending) < max(1, prefetch)
+            and (end_offset is None or next_offset < end_offset)
+        ):
+            page_limit = page_size
+            if end_offset is not None:
+                page_limit = min(page_size, end_offset - next_offset)
+
+            future = executor.submit(
+                list_transactions_page,
+                start_date, end_date, account_id, page_limit, next_offset,
+            )
+            pending.append((future, page_limit))
+            next_offset += page_limit
+
+    try:
+        request_pages()
+        while pending:
+            future, page_limit = pending.popleft()
+            transactions = future.result()
+
+            # A short page is the last one, later pages are not needed
+            done = len(transactions) < page_limit
+            request_pages()
+
+            yield from transactions
+
+            if done:
+                return
+    finally:
+        for future, _ in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
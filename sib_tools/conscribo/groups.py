@@ -2,6 +2,8 @@ import keyring.credentials
 import requests
 import json
 import keyring
+import threading
+from datetime import datetime, timedelta
 from getpass import getpass
 
 from ..canonical import canonical_key
@@ -12,31 +14,143 @@ from dataclasses import dataclass
 
 group_wil_geen_email_van_ons_ontvangen = 36
 
-entity_groups = None
+DEFAULT_GROUP_TTL = timedelta(minutes=10)
 
-def get_group_members_cached(group_id) -> set[str]:
-    entity_groups = list_entity_groups()
 
-    group = next((g for g in entity_groups if g["id"] == str(group_id)), None)
-    if group is None:
+def normalize_group_name(name: str) -> str:
+    return name.lower().replace(" ", "_").replace("-", "_")
+
+
+class GroupIndex:
+    """
+    All Conscribo entity groups, fetched with a single request and indexed by
+    id, normalized name and parent id. The index is refetched after the TTL,
+    or on refresh(). Membership changes made through this module are applied
+    to the index as well, so later reads see them without a refetch.
+    """
+
+    def __init__(self, ttl: timedelta = DEFAULT_GROUP_TTL):
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.fetched_at: datetime | None = None
+        self.groups: list[dict] = []
+        self.by_id: dict[str, dict] = {}
+        self.by_name: dict[str, dict] = {}
+        self.children: dict[str | None, list[str]] = {}
+        self.members: dict[str, frozenset[str]] = {}
+
+    def build(self, groups: list[dict]):
+        self.groups = groups
+        self.by_id = {str(group["id"]): group for group in groups}
+        self.by_name = {normalize_group_name(group["name"]): group for group in groups}
+        self.children = {}
+        for group in groups:
+            parent_id = group.get("parentId")
+            self.children.setdefault(
+                str(parent_id) if parent_id is not None else None, []
+            ).append(str(group["id"]))
+        self.members = {
+            str(group["id"]): frozenset(a["entityId"] for a in group.get("members", []))
+            for group in groups
+        }
+
+    def load(self, force: bool = False):
+        with self.lock:
+            if (
+                not force
+                and self.fetched_at is not None
+                and datetime.now() - self.fetched_at <= self.ttl
+            ):
+                return
+
+            self.build(conscribo_get(f"/relations/groups/")["entityGroups"])
+            self.fetched_at = datetime.now()
+
+    def refresh(self):
+        self.load(force=True)
+
+    def invalidate(self):
+        with self.lock:
+            self.fetched_at = None
+
+    def list_groups(self) -> list[dict]:
+        with self.lock:
+            self.load()
+            return self.groups
+
+    def get(self, group_id) -> dict | None:
+        with self.lock:
+            self.load()
+            return self.by_id.get(str(group_id))
+
+    def find_by_name(self, name: str) -> dict | None:
+        with self.lock:
+            self.load()
+            return self.by_name.get(normalize_group_name(name))
+
+    def get_children(self, group_id) -> list[dict]:
+        with self.lock:
+            self.load()
+            return [self.by_id[child] for child in self.children.get(str(group_id), [])]
+
+    def get_members(self, group_id) -> frozenset[str] | None:
+        with self.lock:
+            self.load()
+            return self.members.get(str(group_id))
+
+    def set_members(self, group_id, members: frozenset[str]):
+        """
+        Replace the members of a group in the index, if it is loaded.
+        """
+        with self.lock:
+            group = self.by_id.get(str(group_id))
+            if self.fetched_at is None or group is None:
+                return
+
+            # Replace the group instead of changing it, as callers may hold
+            # the old one.
+            updated = dict(group, members=[{"entityId": m} for m in sorted(members)])
+            self.build([updated if g is group else g for g in self.groups])
+
+    def add_members(self, group_id, user_ids: list[str]):
+        with self.lock:
+            current = self.members.get(str(group_id))
+            if current is not None:
+                self.set_members(group_id, current | {str(u) for u in user_ids})
+
+    def remove_members(self, group_id, user_ids: list[str]):
+        with self.lock:
+            current = self.members.get(str(group_id))
+            if current is not None:
+                self.set_members(group_id, current - {str(u) for u in user_ids})
+
+
+group_index = GroupIndex()
+
+
+def get_group_members_cached(group_id) -> set[str]:
+    members = group_index.get_members(group_id)
+    if members is None:
         return get_group_members(group_id)
 
-    return {a["entityId"] for a in group["members"]}
+    return set(members)
 
 
 def get_group_members(group_id) -> set[str]:
-    ans = conscribo_get(f"/relations/groups/{group_id}/")
+    group = group_index.get(group_id)
+    if group is None:
+        # Not in the index, so ask for the group itself
+        ans = conscribo_get(f"/relations/groups/{group_id}/")
 
-    if len(ans["entityGroups"]) != 1:
-        print(f"Error: {ans}")
-        raise Exception("Unexpected number of entity groups")
+        if len(ans["entityGroups"]) != 1:
+            print(f"Error: {ans}")
+            raise Exception("Unexpected number of entity groups")
 
-    ans = ans["entityGroups"][0]
-    name = ans["name"]
+        group = ans["entityGroups"][0]
 
-    print(f"{name} ({ans['id']}) has {len(ans['members'])} members")
+    print(f"{group['name']} ({group['id']}) has {len(group['members'])} members")
 
-    return {a["entityId"] for a in ans["members"]}
+    return {a["entityId"] for a in group["members"]}
 
 @dataclass
 class Groups:
@@ -60,11 +174,7 @@ def get_block_email_members():
     return get_group_members(group_wil_geen_email_van_ons_ontvangen)
 
 def list_entity_groups():
-    global entity_groups
-    if entity_groups is None:
-        entity_groups = conscribo_get(f"/relations/groups/")["entityGroups"]
-
-    return entity_groups
+    return group_index.list_groups()
 
 def list_entity_groups_by_name():
     """
@@ -75,37 +185,34 @@ def list_entity_groups_by_name():
     }
 
 def find_group_id_by_name(name: str) -> int | None:
-    def normalize(name : str) -> str:
-        return name.lower().replace(" ", "_").replace("-", "_")
-    
-    groups = {
-        normalize(group["name"]): group for group in list_entity_groups()
-    }
-
-    group = groups.get(normalize(name))
+    group = group_index.find_by_name(name)
     return group["id"] if group else None
 
 def add_relations_to_group(
     group_id : int,
     user_ids : list[str],
 ):
-    return conscribo_post(
+    ans = conscribo_post(
         f"/relations/groups/{group_id}/members/",
         json={
             "relationIds": user_ids
         },
     )
+    group_index.add_members(group_id, user_ids)
+    return ans
 
 def remove_relations_from_group(
     group_id : int,
     user_ids : list[str],
 ):
-    return conscribo_delete(
+    ans = conscribo_delete(
         f"/relations/groups/{group_id}/members/",
         params={
             "relationIds": user_ids
         }, # type: ignore
     )
+    group_index.remove_members(group_id, user_ids)
+    return ans
 
 
 def set_group_members(
@@ -0,0 +1,95 @@
+"""
+Process-wide cache of Conscribo relation snapshots.
+
+Several syncs in one run (Cognito, Laposta, Google Contacts, Google Groups)
+each ask for the active members. Without a cache, every one of them downloads
+the full member base again. Snapshots are keyed by entity type and the
+requested fields, expire after a TTL, and are invalidated explicitly after
+writes to Conscribo.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Hashable
+
+DEFAULT_TTL = timedelta(minutes=10)
+
+
+class RelationSnapshotCache:
+    def __init__(self, ttl: timedelta = DEFAULT_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: dict[Hashable, tuple[datetime, Any]] = {}
+        # One lock per key, so concurrent callers wait for a single fetch
+        # instead of all downloading the same snapshot.
+        self.key_locks: dict[Hashable, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_key_lock(self, key: Hashable) -> threading.Lock:
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Hashable) -> Any | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            stored_at, value = entry
+            if datetime.now() - stored_at > self.ttl:
+                del self.entries[key]
+                return None
+
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self.lock:
+            self.entries[key] = (datetime.now(), value)
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for key, or calls fetch() and caches its
+        result if there is no fresh entry.
+        """
+        with self.get_key_lock(key):
+            value = self.get(key)
+            if value is not None:
+                with self.lock:
+                    self.hits += 1
+                return value
+
+            with self.lock:
+                self.misses += 1
+
+            value = fetch()
+            self.put(key, value)
+            return value
+
+    def invalidate(self, entity_type: str | None = None):
+        """
+        Drop cached relation snapshots, for all entity types or only for the
+        given one. Field definitions are kept.
+        """
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if not isinstance(key, tuple) or key[0] != "relations":
+                    continue
+
+                if entity_type is None or key[1] == entity_type:
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+            }
+
+
+relation_cache = RelationSnapshotCache()
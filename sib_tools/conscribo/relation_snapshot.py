@@ -0,0 +1,391 @@
+"""
+Local on-disk snapshot of Conscribo relations, for incremental fetching.
+
+The snapshot is a SQLite file with one row per relation, holding the raw
+relation and a content hash. Every fetch is compared against it, and
+additions, changes and removals are written to a change journal.
+
+If a modification date field is configured (``CONSCRIBO_MODIFIED_FIELD``),
+later runs only request the relations changed since the last snapshot, plus a
+cheap probe of all relation codes to detect removals. The result is merged
+into the snapshot, and the full, up-to-date list is returned.
+
+Without such a field, probe fields can be configured instead
+(``CONSCRIBO_PROBE_FIELDS``, comma separated): later runs then request only
+the code and probe fields of all relations, and fetch the full fields of the
+relations that are new or whose probe fields differ from the snapshot. Changes
+to other fields are only picked up by the full fetch that is still done every
+MAX_INCREMENTAL_AGE. With neither configured, the relations are fetched in
+full, but are still diffed and journaled.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Callable
+
+from .auth import ApiRequestError
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.path.expanduser("~/.sib_conscribo_snapshot.sqlite")
+
+# Name of a Conscribo date field that holds the last modification date of a
+# relation. Conscribo does not offer one by default, so it must be configured.
+# It is filtered on as {"operator": ">=", "value": "YYYY-MM-DD"}.
+MODIFIED_FIELD = os.environ.get("CONSCRIBO_MODIFIED_FIELD") or None
+
+# Names of cheap Conscribo fields that change along with a relation, to probe
+# for changes when there is no modification date field.
+PROBE_FIELDS = [
+    field.strip()
+    for field in os.environ.get("CONSCRIBO_PROBE_FIELDS", "").split(",")
+    if field.strip()
+]
+
+# Codes per request when fetching the relations a probe found changed
+PROBE_FETCH_BATCH_SIZE = 500
+
+# Fetch in full anyway if the last snapshot is older than this.
+MAX_INCREMENTAL_AGE = timedelta(days=7)
+
+lock = threading.Lock()
+
+
+def relation_hash(relation: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(relation, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def probe_hash(relation: dict) -> str:
+    return relation_hash({field: relation.get(field) for field in PROBE_FIELDS})
+
+
+def fields_hash(field_names: list[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(field_names)).encode("utf-8")).hexdigest()
+
+
+def relation_code(key: str, relation: dict) -> str:
+    return str(relation.get("code") or key)
+
+
+def sort_key(code: str):
+    return (0, int(code), "") if code.isdigit() else (1, 0, code)
+
+
+def open_snapshot(path: str = SNAPSHOT_PATH) -> sqlite3.Connection:
+    is_new = not os.path.exists(path)
+    conn = sqlite3.connect(path)
+    if is_new:
+        # Contains personal data of members
+        os.chmod(path, 0o600)
+
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS relations (
+            entity_type TEXT NOT NULL,
+            code TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (entity_type, code)
+        );
+        CREATE TABLE IF NOT EXISTS sync_state (
+            entity_type TEXT PRIMARY KEY,
+            fields_hash TEXT NOT NULL,
+            last_sync TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity_type TEXT NOT NULL,
+            code TEXT NOT NULL,
+            change TEXT NOT NULL,
+            at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS journal_at ON journal (at);
+        CREATE TABLE IF NOT EXISTS probes (
+            entity_type TEXT NOT NULL,
+            code TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (entity_type, code)
+        );
+        """
+    )
+    return conn
+
+
+def filter_relations(
+    post: Callable[[str, dict], dict],
+    entity_type: str,
+    field_names: list[str],
+    filters: list[dict],
+) -> dict[str, dict]:
+    result = post(
+        "/relations/filters/",
+        {
+            "entityType": entity_type,
+            "requestedFields": field_names,
+            "filters": filters,
+        },
+    )
+    relations = result.get("relations") or {}
+    return {relation_code(k, v): v for k, v in relations.items()}
+
+
+def is_incremental_configured() -> bool:
+    """
+    Whether a modification date field or probe fields are configured, so
+    that fetch_relations_incremental can avoid fetching everything.
+    """
+    return MODIFIED_FIELD is not None or bool(PROBE_FIELDS)
+
+
+def fetch_by_codes(
+    post: Callable[[str, dict], dict],
+    entity_type: str,
+    field_names: list[str],
+    codes: list[str],
+) -> dict[str, dict]:
+    fetched: dict[str, dict] = {}
+    codes = sorted(codes, key=sort_key)
+    for i in range(0, len(codes), PROBE_FETCH_BATCH_SIZE):
+        batch = codes[i : i + PROBE_FETCH_BATCH_SIZE]
+        fetched.update(
+            filter_relations(
+                post,
+                entity_type,
+                field_names,
+                [
+                    {
+                        "fieldName": "code",
+                        "operator": "=",
+                        "value": [int(c) if c.isdigit() else c for c in batch],
+                    }
+                ],
+            )
+        )
+    return fetched
+
+
+def update_probes(
+    conn: sqlite3.Connection,
+    entity_type: str,
+    fetched: dict[str, dict],
+    current_codes: set[str] | None,
+):
+    """
+    Store the probe hashes of the fetched relations, and forget those of the
+    removed ones.
+    """
+    if current_codes is None:
+        conn.execute("DELETE FROM probes WHERE entity_type = ?", (entity_type,))
+    else:
+        conn.executemany(
+            "DELETE FROM probes WHERE entity_type = ? AND code = ?",
+            [
+                (entity_type, code)
+                for (code,) in conn.execute(
+                    "SELECT code FROM probes WHERE entity_type = ?", (entity_type,)
+                ).fetchall()
+                if code not in current_codes
+            ],
+        )
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO probes (entity_type, code, hash) VALUES (?, ?, ?)",
+        [(entity_type, code, probe_hash(relation)) for code, relation in fetched.items()],
+    )
+
+
+def merge_into_snapshot(
+    conn: sqlite3.Connection,
+    entity_type: str,
+    fetched: dict[str, dict],
+    current_codes: set[str] | None,
+    now: str,
+) -> dict[str, int]:
+    """
+    Merge fetched relations into the snapshot and journal the differences.
+
+    If current_codes is None, fetched is the complete set of relations.
+    Otherwise it only holds the changed ones, and current_codes tells which
+    relations still exist.
+    """
+    stored_hashes = dict(
+        conn.execute(
+            "SELECT code, hash FROM relations WHERE entity_type = ?", (entity_type,)
+        ).fetchall()
+    )
+    if current_codes is None:
+        current_codes = set(fetched.keys())
+
+    counts = {"added": 0, "changed": 0, "removed": 0}
+    journal = []
+
+    for code, relation in fetched.items():
+        new_hash = relation_hash(relation)
+        old_hash = stored_hashes.get(code)
+        if old_hash == new_hash:
+            continue
+
+        change = "added" if old_hash is None else "changed"
+        counts[change] += 1
+        journal.append((entity_type, code, change, now))
+        conn.execute(
+            "INSERT OR REPLACE INTO relations (entity_type, code, hash, data) "
+            "VALUES (?, ?, ?, ?)",
+            (entity_type, code, new_hash, json.dumps(relation)),
+        )
+
+    for code in set(stored_hashes.keys()) - current_codes:
+        counts["removed"] += 1
+        journal.append((entity_type, code, "removed", now))
+        conn.execute(
+            "DELETE FROM relations WHERE entity_type = ? AND code = ?",
+            (entity_type, code),
+        )
+
+    conn.executemany(
+        "INSERT INTO journal (entity_type, code, change, at) VALUES (?, ?, ?, ?)",
+        journal,
+    )
+    return counts
+
+
+def fetch_relations_incremental(
+    post: Callable[[str, dict], dict],
+    entity_type: str,
+    field_names: list[str],
+    path: str = SNAPSHOT_PATH,
+) -> list[dict]:
+    """
+    Returns all relations of entity_type, using the local snapshot to only
+    transfer the relations that changed since the last run, when possible.
+
+    post is called as post(url, json) and should return the parsed response,
+    like conscribo_post.
+    """
+    with lock:
+        conn = open_snapshot(path)
+        try:
+            now = datetime.now()
+            state = conn.execute(
+                "SELECT fields_hash, last_sync FROM sync_state WHERE entity_type = ?",
+                (entity_type,),
+            ).fetchone()
+
+            is_recent = (
+                state is not None
+                and state[0] == fields_hash(field_names)
+                and now - datetime.fromisoformat(state[1]) < MAX_INCREMENTAL_AGE
+            )
+            use_probes = bool(PROBE_FIELDS) and all(
+                field in field_names for field in PROBE_FIELDS
+            )
+
+            if is_recent and MODIFIED_FIELD is not None and MODIFIED_FIELD in field_names:
+                # Dates have day precision, so include the day of the last
+                # sync again.
+                since = state[1][:10]
+                try:
+                    fetched = filter_relations(
+                        post,
+                        entity_type,
+                        field_names,
+                        [{"fieldName": MODIFIED_FIELD, "operator": ">=", "value": since}],
+                    )
+                    current_codes = set(
+                        filter_relations(post, entity_type, ["code"], []).keys()
+                    )
+                    mode = f"incremental since {since}"
+                except ApiRequestError as e:
+                    # E.g. a field that is not a date field
+                    logger.warning(
+                        f"Conscribo rejected the filter on {MODIFIED_FIELD}, "
+                        f"fetching all {entity_type} relations: {e}"
+                    )
+                    fetched = filter_relations(post, entity_type, field_names, [])
+                    current_codes = None
+                    mode = "full"
+            elif is_recent and use_probes:
+                probed = filter_relations(post, entity_type, ["code"] + PROBE_FIELDS, [])
+                stored_probes = dict(
+                    conn.execute(
+                        "SELECT code, hash FROM probes WHERE entity_type = ?",
+                        (entity_type,),
+                    ).fetchall()
+                )
+                changed_codes = [
+                    code
+                    for code, relation in probed.items()
+                    if stored_probes.get(code) != probe_hash(relation)
+                ]
+                fetched = fetch_by_codes(post, entity_type, field_names, changed_codes)
+                current_codes = set(probed.keys())
+                mode = f"probed {len(probed)}"
+            else:
+                if not is_incremental_configured():
+                    logger.warning(
+                        "Neither CONSCRIBO_MODIFIED_FIELD nor CONSCRIBO_PROBE_FIELDS "
+                        f"is set, fetching all Conscribo {entity_type} relations."
+                    )
+                fetched = filter_relations(post, entity_type, field_names, [])
+                current_codes = None
+                mode = "full"
+
+            counts = merge_into_snapshot(
+                conn, entity_type, fetched, current_codes, now.isoformat()
+            )
+            if use_probes:
+                update_probes(conn, entity_type, fetched, current_codes)
+            if not mode.startswith("probed"):
+                # A probe misses changes to other fields, so a probed run
+                # does not postpone the next full fetch.
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (entity_type, fields_hash, last_sync) "
+                    "VALUES (?, ?, ?)",
+                    (entity_type, fields_hash(field_names), now.isoformat()),
+                )
+            conn.commit()
+
+            logger.info(
+                f"Conscribo {entity_type} snapshot ({mode}): fetched {len(fetched)}, "
+                f"{counts['added']} added, {counts['changed']} changed, "
+                f"{counts['removed']} removed"
+            )
+
+            rows = conn.execute(
+                "SELECT code, data FROM relations WHERE entity_type = ?",
+                (entity_type,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    rows.sort(key=lambda row: sort_key(row[0]))
+    return [json.loads(data) for _, data in rows]
+
+
+def list_changes(
+    since: str, entity_type: str | None = None, path: str = SNAPSHOT_PATH
+) -> list[dict]:
+    """
+    Returns the journaled changes since the given ISO date/time.
+    """
+    conn = open_snapshot(path)
+    try:
+        query = "SELECT entity_type, code, change, at FROM journal WHERE at >= ?"
+        params: list[str] = [since]
+        if entity_type is not None:
+            query += " AND entity_type = ?"
+            params.append(entity_type)
+
+        return [
+            {"entity_type": e, "code": c, "change": ch, "at": at}
+            for e, c, ch, at in conn.execute(query + " ORDER BY id", params)
+        ]
+    finally:
+        conn.close()
@@ -9,10 +9,21 @@ from ..canonical.canonical_key import flatten_dict
 
 from .constants import api_url
 from .auth import conscribo_post, conscribo_get, conscribo_patch
+from .relation_cache import relation_cache
 
 ENTITY_TYPE_PERSON = "persoon"
 ENTITY_TYPE_ALUMNUS = "re__nisten"
 
+# When set, relations are fetched through the local snapshot, see
+# relation_snapshot.py.
+incremental_fetch = False
+
+
+def enable_incremental_fetch(enabled: bool = True):
+    global incremental_fetch
+    incremental_fetch = enabled
+    relation_cache.invalidate()
+
 # print(json.dumps(entity_groups, indent=2))
 
 def list_filter_raw(fieldNames, filters):
@@ -39,21 +50,7 @@ def list_filter_raw(fieldNames, filters):
     )
 
 def relation_to_canonical(relation):
-    canonical = dict()
-
-    to_canonical = canonical_key.get_conscribo_to_key()
-
-    flattened_relation = flatten_dict(relation)
-
-    for key, value in flattened_relation.items():
-        new_key = to_canonical.get(key, None)
-
-        if new_key is not None:
-            canonical[new_key] = value
-            continue
-
-        other = canonical.setdefault("other", dict())
-        other[key] = value
+    canonical = canonical_key.get_schema().to_canonical("Conscribo", relation)
 
     pronouns = canonical.get("pronouns", None)
     if pronouns is not None and isinstance(pronouns, int):
@@ -70,20 +67,7 @@ def relation_to_canonical(relation):
 
 
 def relation_to_canonical_alumnus(relation):
-    canonical = dict()
-    to_canonical = canonical_key.get_conscribo_alumnus_to_key()
-
-    flattened_relation = flatten_dict(relation)
-
-    for key, value in flattened_relation.items():
-        new_key = to_canonical.get(key, None)
-
-        if new_key is not None:
-            canonical[new_key] = value
-            continue
-
-        other = canonical.setdefault("other", dict())
-        other[key] = value
+    canonical = canonical_key.get_schema().to_canonical("ConscriboAlumni", relation)
 
     # pronouns = canonical.get("pronouns", None)
     # if pronouns is not None and isinstance(pronouns, int):
@@ -101,7 +85,7 @@ def relation_to_canonical_alumnus(relation):
 
 def update_relation(canonical):
     canonical = flatten_dict(canonical)
-    to_conscribo = canonical_key.get_key_to_conscribo()
+    to_conscribo = canonical_key.get_schema().from_key["Conscribo"]
 
     conscribo_relation = dict()
 
@@ -122,12 +106,13 @@ def update_relation(canonical):
             "fields": conscribo_relation,
         },
     )
+    relation_cache.invalidate()
 
     print("\n\n")
 
 def create_relation_member(canonical, logger : logging.Logger) -> str:
     canonical = flatten_dict(canonical)
-    to_conscribo = canonical_key.get_key_to_conscribo()
+    to_conscribo = dict(canonical_key.get_schema().from_key["Conscribo"])
 
     to_conscribo["house_number_full"] = to_conscribo.get("house_number_full") or "huisnr"
 
@@ -172,13 +157,15 @@ def create_relation_member(canonical, logger : logging.Logger) -> str:
 
     logger.info(f"Creating Conscribo relation with\n{json.dumps(conscribo_relation, indent=4)}")
 
+    entity_type = canonical.get("conscribo_entity_type", ENTITY_TYPE_PERSON)
     ans = conscribo_post(
         "/relations/",
         json={
-            "entityType": canonical.get("conscribo_entity_type", ENTITY_TYPE_PERSON),
+            "entityType": entity_type,
             "fields": conscribo_relation,
         },
     )
+    relation_cache.invalidate(entity_type)
 
     conscribo_id = ans["code"]
 
@@ -186,30 +173,61 @@ def create_relation_member(canonical, logger : logging.Logger) -> str:
     return conscribo_id
 
 
-def list_relations_persoon():
-    fieldDefinitions = conscribo_get(f"/relations/fieldDefinitions/persoon")["fields"]
+def get_field_definitions(entity_type: str) -> list[dict]:
+    return relation_cache.get_or_fetch(
+        ("fieldDefinitions", entity_type),
+        lambda: conscribo_get(f"/relations/fieldDefinitions/{entity_type}")["fields"],
+    )
 
-    fieldNames = [field["fieldName"] for field in fieldDefinitions]
 
-    # print(f"Field definitions: {fieldDefinitions}")
+def list_relations_raw(entity_type: str, fieldNames: list[str] | None = None) -> list[dict]:
+    """
+    Returns the relations of the given entity type as returned by Conscribo.
+    If fieldNames is None, all fields are requested.
 
-    result = conscribo_post(
-        "/relations/filters/",
-        json={
-            "entityType": "persoon",
-            "requestedFields": fieldNames,
-            "filters": [
-                # {
-                #     "fieldName": "code",
-                #     "operator": "=",
-                #     "value": [329],  # Vincent
-                # }
-            ],
-        },
+    Results are shared through the relation cache, so several syncs in one
+    run only download the relations once.
+    """
+    if fieldNames is None:
+        fieldNames = [
+            field["fieldName"] for field in get_field_definitions(entity_type)
+        ]
+
+    def fetch():
+        if incremental_fetch:
+            from .relation_snapshot import fetch_relations_incremental
+
+            return fetch_relations_incremental(
+                lambda url, body: conscribo_post(url, json=body),
+                entity_type,
+                fieldNames,
+            )
+
+        result = conscribo_post(
+            "/relations/filters/",
+            json={
+                "entityType": entity_type,
+                "requestedFields": fieldNames,
+                "filters": [
+                    # {
+                    #     "fieldName": "code",
+                    #     "operator": "=",
+                    #     "value": [329],  # Vincent
+                    # }
+                ],
+            },
+        )
+        return list(result["relations"].values())
+
+    return relation_cache.get_or_fetch(
+        ("relations", entity_type, tuple(fieldNames)), fetch
     )
 
+
+def list_relations_persoon():
     relations = [
-        relation_to_canonical(relation) for relation in result["relations"].values()
+        relation_to_canonical(relation)
+        for relation in list_relations_raw(ENTITY_TYPE_PERSON)
     ]
 
     return relations
@@ -224,30 +242,9 @@ def list_relations_members():
 
 
 def list_relations_alumnus():
-    fieldDefinitions = conscribo_get(f"/relations/fieldDefinitions/re__nisten")[
-        "fields"
-    ]
-
-    fieldNames = [field["fieldName"] for field in fieldDefinitions]
-
-    result = conscribo_post(
-        "/relations/filters/",
-        json={
-            "entityType": "re__nisten",
-            "requestedFields": fieldNames,
-            "filters": [
-                # {
-                #     "fieldName": "code",
-                #     "operator": "=",
-                #     "value": [329],  # Vincent
-                # }
-            ],
-        },
-    )
-
     relations = [
         relation_to_canonical_alumnus(relation)
-        for relation in result["relations"].values()
+        for relation in list_relations_raw(ENTITY_TYPE_ALUMNUS)
     ]
 
     return relations
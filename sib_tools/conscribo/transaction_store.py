@@ -0,0 +1,274 @@
+"""
+Local cache of Conscribo financial transactions, for reports over date ranges.
+
+Transactions are stored in a SQLite file, one row per transaction and one per
+transaction row, keyed by transactionId and indexed by date. The store keeps
+track of the date ranges it has fetched completely, so a report only downloads
+the parts of its range that are not cached yet.
+
+Amounts are stored as integers (in units of 1/AMOUNT_SCALE euro), so the
+per-account totals are summed exactly by SQLite and returned as Decimals.
+
+Transactions can still be booked or changed for recent dates, so the last
+RECENT_DAYS days are never marked as cached, and are fetched again every time.
+Older transactions can still be corrected, moved or deleted, so a cached range
+expires MAX_RANGE_AGE_DAYS after it was fetched; it is then fetched again,
+replacing the stored transactions of the range.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+
+STORE_PATH = os.path.expanduser("~/.sib_conscribo_transactions.sqlite")
+
+# Transactions per write to the store
+PAGE_SIZE = 100
+
+AMOUNT_SCALE = 10_000
+
+RECENT_DAYS = 7
+
+MAX_RANGE_AGE_DAYS = 30
+
+lock = threading.Lock()
+
+
+def open_store(path: str = STORE_PATH) -> sqlite3.Connection:
+    is_new = not os.path.exists(path)
+    conn = sqlite3.connect(path)
+    if is_new:
+        # Contains the financial administration
+        os.chmod(path, 0o600)
+
+    # account_nr has no type, so it keeps the type Conscribo returned
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id TEXT PRIMARY KEY,
+            date TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+        CREATE TABLE IF NOT EXISTS transaction_rows (
+            transaction_id TEXT NOT NULL,
+            row_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            account_nr,
+            side TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY (transaction_id, row_id)
+        );
+        CREATE INDEX IF NOT EXISTS transaction_rows_date ON transaction_rows (date);
+        CREATE TABLE IF NOT EXISTS fetched_ranges (
+            start TEXT NOT NULL,
+            end TEXT NOT NULL,
+            fetched_at TEXT NOT NULL
+        );
+        """
+    )
+    return conn
+
+
+def to_units(amount) -> int:
+    units = Decimal(str(amount)) * AMOUNT_SCALE
+    if units != units.to_integral_value():
+        raise ValueError(f"Amount {amount} has more decimals than the store keeps")
+    return int(units)
+
+
+def day_before(day: str) -> str:
+    return (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+
+
+def day_after(day: str) -> str:
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+def get_cached_ranges(conn: sqlite3.Connection) -> list[tuple[str, str, str]]:
+    """
+    Returns the cached ranges as (start, end, fetched_at), leaving out the
+    ones fetched more than MAX_RANGE_AGE_DAYS ago.
+    """
+    oldest = (date.today() - timedelta(days=MAX_RANGE_AGE_DAYS)).isoformat()
+    return sorted(
+        conn.execute(
+            "SELECT start, end, fetched_at FROM fetched_ranges WHERE fetched_at >= ?",
+            (oldest,),
+        ).fetchall()
+    )
+
+
+def set_cached_ranges(conn: sqlite3.Connection, ranges: list[tuple[str, str, str]]):
+    """
+    Store the (start, end, fetched_at) ranges, merging the ones that touch
+    and were fetched on the same day.
+    """
+    merged: list[tuple[str, str, str]] = []
+    for start, end, fetched_at in sorted(ranges):
+        if merged and fetched_at == merged[-1][2] and start <= day_after(merged[-1][1]):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end), fetched_at)
+        else:
+            merged.append((start, end, fetched_at))
+
+    conn.execute("DELETE FROM fetched_ranges")
+    conn.executemany(
+        "INSERT INTO fetched_ranges (start, end, fetched_at) VALUES (?, ?, ?)", merged
+    )
+
+
+def missing_ranges(
+    cached: list[tuple[str, str]], start: str, end: str
+) -> list[tuple[str, str]]:
+    """
+    Returns the parts of [start, end] that are not covered by the cached
+    ranges.
+    """
+    missing = []
+    current = start
+    for cached_start, cached_end in sorted(cached):
+        if cached_end < current:
+            continue
+        if cached_start > end:
+            break
+        if cached_start > current:
+            missing.append((current, day_before(cached_start)))
+        current = max(current, day_after(cached_end))
+        if current > end:
+            return missing
+
+    if current <= end:
+        missing.append((current, end))
+    return missing
+
+
+def store_page(conn: sqlite3.Connection, transactions: list[dict]):
+    for tx in transactions:
+        transaction_id = str(tx["transactionId"])
+        conn.execute(
+            "DELETE FROM transaction_rows WHERE transaction_id = ?", (transaction_id,)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO transactions (transaction_id, date, data) VALUES (?, ?, ?)",
+            (transaction_id, tx["date"], json.dumps(tx)),
+        )
+        conn.executemany(
+            "INSERT INTO transaction_rows "
+            "(transaction_id, row_id, date, account_nr, side, amount) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    transaction_id,
+                    str(row_id),
+                    tx["date"],
+                    row["accountNr"],
+                    row["side"],
+                    to_units(row["amount"]),
+                )
+                for row_id, row in (tx.get("transactionRows") or {}).items()
+            ],
+        )
+
+
+def fetch_range(conn: sqlite3.Connection, start: str, end: str):
+    """
+    Replace the stored transactions of [start, end] by a fresh download.
+    """
+    conn.execute("DELETE FROM transactions WHERE date BETWEEN ? AND ?", (start, end))
+    conn.execute("DELETE FROM transaction_rows WHERE date BETWEEN ? AND ?", (start, end))
+
+    from .finance import iter_conscribo_transactions
+
+    page = []
+    for tx in iter_conscribo_transactions(start, end):
+        page.append(tx)
+        if len(page) >= PAGE_SIZE:
+            store_page(conn, page)
+            page = []
+
+    store_page(conn, page)
+
+
+def ensure_range(
+    start: str, end: str, refresh: bool = False, path: str = STORE_PATH
+):
+    """
+    Make sure all transactions of [start, end] are in the store, downloading
+    only the parts that are not cached or whose cache expired (or all of it,
+    with refresh).
+    """
+    with lock:
+        conn = open_store(path)
+        try:
+            cached = get_cached_ranges(conn)
+            if refresh:
+                # Forget the cached parts of [start, end]
+                cached = [
+                    (part_start, part_end, fetched_at)
+                    for cached_start, cached_end, fetched_at in cached
+                    for part_start, part_end in missing_ranges(
+                        [(start, end)], cached_start, cached_end
+                    )
+                ]
+
+            to_fetch = missing_ranges(
+                [(cached_start, cached_end) for cached_start, cached_end, _ in cached],
+                start,
+                end,
+            )
+            for fetch_start, fetch_end in to_fetch:
+                print(f"Fetching Conscribo transactions from {fetch_start} to {fetch_end}")
+                fetch_range(conn, fetch_start, fetch_end)
+
+            # Recent days may still change, so do not remember them as cached
+            today = date.today()
+            last_final_day = (today - timedelta(days=RECENT_DAYS)).isoformat()
+            fetched = [
+                (fetch_start, min(fetch_end, last_final_day), today.isoformat())
+                for fetch_start, fetch_end in to_fetch
+                if fetch_start <= last_final_day
+            ]
+            set_cached_ranges(conn, cached + fetched)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def sum_per_account(
+    start: str, end: str, path: str = STORE_PATH
+) -> tuple[dict, dict]:
+    """
+    Returns the debet and credit totals per account over [start, end], from
+    the store.
+    """
+    with lock:
+        conn = open_store(path)
+        try:
+            rows = conn.execute(
+                "SELECT account_nr, side, SUM(amount) FROM transaction_rows "
+                "WHERE date BETWEEN ? AND ? GROUP BY account_nr, side",
+                (start, end),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    debet_per_account: dict = {}
+    credit_per_account: dict = {}
+    for account, side, amount in rows:
+        total = Decimal(amount) / AMOUNT_SCALE
+        if side == "debet":
+            debet_per_account[account] = total
+        elif side == "credit":
+            credit_per_account[account] = total
+
+    return debet_per_account, credit_per_account
+
+
+def get_balance_diff(
+    start: str, end: str, refresh: bool = False, path: str = STORE_PATH
+) -> tuple[dict, dict]:
+    ensure_range(start, end, refresh=refresh, path=path)
+    return sum_per_account(start, end, path=path)
@@ -5,7 +5,7 @@ from email import message_from_file
 import re
 import uuid
 from email.message import EmailMessage, Message
-from sib_tools.canonical.canonical_key import get_register_form_to_key
+from sib_tools.canonical.canonical_key import get_schema
 from typing import Any
 
 def extract_fields_from_mail(path_to_eml):
@@ -77,7 +77,7 @@ def extract_fields_from_mail_message(msg : Message):
         open('member-admin/add-to-conscribo/sample2.txt', 'w', encoding="utf-8").write(text_message)
 
 def form_to_canonical(fields : dict[str, str]) -> dict:
-    to_canonical = get_register_form_to_key()
+    to_canonical = get_schema().to_key["RegisterForm"]
     canonical : dict[str, str | dict[str, Any] | Any] = dict()
     agreements : dict[str, str] = dict()
     for k, v in fields.items():
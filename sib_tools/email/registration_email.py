@@ -36,7 +36,7 @@ import re
 
 logger = logging.getLogger("incoming_email.log")
 logger.setLevel(logging.DEBUG)
-file_handler = logging.FileHandler("sib_tools_incoming_email.log")
+file_handler = logging.FileHandler("sib_tools_incoming_email.log", delay=True)
 file_handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s: %(message)s"))
 logger.addHandler(file_handler)
 stream_handler = logging.StreamHandler(sys.stdout)
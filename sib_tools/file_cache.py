@@ -0,0 +1,213 @@
+"""
+Size-bounded, persistent cache of JSON values, in a single SQLite file.
+
+Values are stored zlib-compressed, and every write is a SQLite transaction,
+so a crash never leaves a half-written entry. When the total size of the
+values exceeds max_bytes, the least recently used entries are evicted. The
+total is kept as a running count, so a write does not have to sum all sizes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Iterable, Iterator
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Reads only update the last use time of an entry if it is older than this,
+# so that a read is not always a write.
+TOUCH_INTERVAL = 60
+
+# Eviction frees space down to this fraction of max_bytes, so that a full
+# cache does not evict on every write.
+EVICT_TO_FRACTION = 0.9
+
+
+class FileCache:
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, compress: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        is_new = not os.path.exists(path)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if is_new:
+            os.chmod(path, 0o600)
+
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                compressed INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            """
+        )
+        self.total_bytes = self.sum_sizes()
+
+    def sum_sizes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def entry_size(self, key: str) -> int:
+        row = self.conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def encode(self, value: Any) -> bytes:
+        data = json.dumps(value).encode("utf-8")
+        return zlib.compress(data) if self.compress else data
+
+    @staticmethod
+    def decode(data: bytes, compressed: bool) -> Any:
+        return json.loads(zlib.decompress(data) if compressed else data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, compressed, last_used FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            now = time.time()
+            if now - row[2] > TOUCH_INTERVAL:
+                self.conn.execute(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", (now, key)
+                )
+                self.conn.commit()
+
+        return self.decode(row[0], bool(row[1]))
+
+    def __contains__(self, key: str) -> bool:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (key,)
+            ).fetchone() is not None
+
+    def put(self, key: str, value: Any):
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[tuple[str, Any]]):
+        """
+        Store several values in a single transaction, evicting once at the end.
+        """
+        encoded = [(key, self.encode(value)) for key, value in items]
+        now = time.time()
+        with self.lock:
+            previous_total = self.total_bytes
+            try:
+                with self.conn:
+                    for key, data in encoded:
+                        self.total_bytes += len(data) - self.entry_size(key)
+                        self.conn.execute(
+                            "INSERT OR REPLACE INTO entries "
+                            "(key, value, compressed, size, created, last_used) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (key, data, int(self.compress), len(data), now, now),
+                        )
+                    self.evict()
+            except BaseException:
+                # The transaction was rolled back
+                self.total_bytes = previous_total
+                raise
+
+    def delete(self, key: str):
+        with self.lock:
+            with self.conn:
+                self.total_bytes -= self.entry_size(key)
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self):
+        """
+        If the cache exceeds max_bytes, remove the least recently used entries
+        until it fits in EVICT_TO_FRACTION of it. Must be called with the lock
+        held.
+        """
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        # Other processes may have written to the cache, so start from the
+        # actual total.
+        total = self.total_bytes = self.sum_sizes()
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * EVICT_TO_FRACTION
+        to_remove = []
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        ):
+            if total <= target:
+                break
+            to_remove.append((key,))
+            total -= size
+
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", to_remove)
+        self.total_bytes = total
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, value, compressed FROM entries ORDER BY key"
+            ).fetchall()
+
+        for key, data, compressed in rows:
+            yield key, self.decode(data, bool(compressed))
+
+    def remove_unused(self, days_unused: float) -> list[str]:
+        """
+        Remove the entries not used in the last days_unused days.
+        """
+        cutoff = time.time() - days_unused * 86400
+        with self.lock:
+            with self.conn:
+                removed = [
+                    key for (key,) in self.conn.execute(
+                        "SELECT key FROM entries WHERE last_used < ?", (cutoff,)
+                    )
+                ]
+                self.conn.execute("DELETE FROM entries WHERE last_used < ?", (cutoff,))
+                self.total_bytes = self.sum_sizes()
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        with self.lock:
+            count, size, oldest = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(last_used) FROM entries"
+            ).fetchone()
+            return {
+                "path": self.path,
+                "entries": count,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "file_bytes": os.path.getsize(self.path),
+                "least_recently_used": oldest,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+caches: dict[str, FileCache] = {}
+caches_lock = threading.Lock()
+
+
+def get_cache(path: str, max_bytes: int = DEFAULT_MAX_BYTES) -> FileCache:
+    """
+    Returns the process-wide cache stored at path.
+    """
+    with caches_lock:
+        cache = caches.get(path)
+        if cache is None:
+            cache = caches[path] = FileCache(path, max_bytes=max_bytes)
+        return cache
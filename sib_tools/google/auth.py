@@ -4,14 +4,19 @@ Google Workspace API authentication and group listing utilities.
 
 __all__ = [
     "get_credentials",
+    "get_service",
     "list_groups_directory_api",
     "list_groups_settings_api",
+    "iter_groups_settings_api",
     "check_available",
     "signout",
 ]
 
 import os
-from typing import List, Dict
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 import keyring
@@ -98,64 +103,159 @@ def ensure_credentials():
         )
 
 
+# Credentials per scope set. Service account credentials refresh their own
+# access token, so they can be shared by all threads.
+credentials_cache: dict[tuple[str, ...], service_account.Credentials] = {}
+credentials_lock = threading.Lock()
+
+# Built services per thread, as the httplib2 transport they hold is not
+# thread-safe. Within a thread, the service and its connections are reused.
+thread_services = threading.local()
+
+
 def get_credentials(scopes: List[str]):
     """
     Returns service account credentials with domain-wide delegation.
     """
-    ensure_credentials()
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=scopes
-    )
-    if ADMIN_EMAIL:
-        credentials = credentials.with_subject(ADMIN_EMAIL)
-    return credentials
+    key = tuple(sorted(scopes))
+    with credentials_lock:
+        credentials = credentials_cache.get(key)
+        if credentials is not None:
+            return credentials
+
+        ensure_credentials()
+        credentials = service_account.Credentials.from_service_account_file(
+            SERVICE_ACCOUNT_FILE, scopes=scopes
+        )
+        if ADMIN_EMAIL:
+            credentials = credentials.with_subject(ADMIN_EMAIL)
+
+        credentials_cache[key] = credentials
+        return credentials
+
+
+def get_service(api: str, version: str, scopes: List[str]):
+    """
+    Returns a service object for the given API, built once per thread from the
+    discovery document that ships with googleapiclient.
+    """
+    services = getattr(thread_services, "services", None)
+    if services is None:
+        services = thread_services.services = {}
+
+    key = (api, version, tuple(sorted(scopes)))
+    service = services.get(key)
+    if service is None:
+        service = build(
+            api,
+            version,
+            credentials=get_credentials(scopes),
+            static_discovery=True,
+            cache_discovery=False,
+        )
+        services[key] = service
+
+    return service
+
+
+# Maximum page size of groups.list
+GROUPS_PAGE_SIZE = 200
+
+# How many group settings to fetch at the same time
+DEFAULT_SETTINGS_WORKERS = 8
 
 
 def list_groups_directory_api() -> List[Dict]:
     """
-    List Google Groups using the Directory API.
+    List Google Groups using the Directory API, following all pages.
     Returns a list of group resource dicts.
     """
-    creds = get_credentials(directory_scopes)
-    service = build("admin", "directory_v1", credentials=creds)
+    service = get_service("admin", "directory_v1", directory_scopes)
     try:
-        results = service.groups().list(customer="my_customer").execute()
-        return results.get("groups", [])
+        groups = []
+        page_token = None
+        while True:
+            results = service.groups().list(
+                customer="my_customer",
+                maxResults=GROUPS_PAGE_SIZE,
+                pageToken=page_token,
+            ).execute()
+            groups.extend(results.get("groups", []))
+
+            page_token = results.get("nextPageToken")
+            if not page_token:
+                return groups
     except Exception as e:
         print(f"Error listing groups via Directory API: {e}")
         return []
 
 
+def get_group_settings(email: str) -> Dict | None:
+    # get_service gives every worker thread its own service
+    service = get_service("groupssettings", "v1", groups_settings_scopes)
+    try:
+        return service.groups().get(groupUniqueId=email).execute()
+    except Exception as e:
+        print(f"Error retrieving settings for group {email}: {e}", file=sys.stderr)
+        return None
+
+
+def iter_groups_settings_api(
+    max_workers: int = DEFAULT_SETTINGS_WORKERS, ordered: bool = False
+) -> Iterator[Dict]:
+    """
+    Yield the Groups Settings of all groups as they arrive, or in directory
+    order if ordered is set. Up to max_workers settings are fetched
+    concurrently.
+    """
+    emails = [group["email"] for group in list_groups_directory_api() if group.get("email")]
+    if not emails:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(emails)))) as executor:
+        if ordered:
+            results = executor.map(get_group_settings, emails)
+        else:
+            futures = [executor.submit(get_group_settings, email) for email in emails]
+            results = (future.result() for future in as_completed(futures))
+
+        for settings in results:
+            if settings is not None:
+                yield settings
+
+
 def list_groups_settings_api() -> List[Dict]:
     """
     List Google Groups using the Groups Settings API (requires group emails).
-    Returns a list of group settings dicts.
-    """
-    groups = list_groups_directory_api()
-    creds = get_credentials(groups_settings_scopes)
-    service = build("groupssettings", "v1", credentials=creds)
-    group_settings = []
-    for group in groups:
-        email = group.get("email")
-        if email:
-            try:
-                settings = service.groups().get(groupUniqueId=email).execute()
-                group_settings.append(settings)
-            except Exception as e:
-                print(f"Error retrieving settings for group {email}: {e}")
-    return group_settings
+    Returns a list of group settings dicts, in directory order.
+    """
+    return list(iter_groups_settings_api(ordered=True))
+
+
+# Maximum page size of members.list
+MEMBERS_PAGE_SIZE = 200
 
 
 def list_group_members_api(group_email: str) -> list:
     """
-    List members of a Google Group using the Directory API.
-    Returns a list of member dicts.
+    List members of a Google Group using the Directory API, following all
+    pages. Returns a list of member dicts.
     """
-    creds = get_credentials(directory_scopes)
-    service = build("admin", "directory_v1", credentials=creds)
+    service = get_service("admin", "directory_v1", directory_scopes)
     try:
-        results = service.members().list(groupKey=group_email).execute()
-        return results.get("members", [])
+        members = []
+        page_token = None
+        while True:
+            results = service.members().list(
+                groupKey=group_email,
+                maxResults=MEMBERS_PAGE_SIZE,
+                pageToken=page_token,
+            ).execute()
+            members.extend(results.get("members", []))
+
+            page_token = results.get("nextPageToken")
+            if not page_token:
+                return members
     except Exception as e:
         print(f"Error listing members for group {group_email}: {e}")
         return []
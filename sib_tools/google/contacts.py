@@ -2,8 +2,7 @@
 Sync Conscribo members to Google Contacts, only considering contacts with label 'Member'.
 """
 
-from sib_tools.google.auth import get_credentials
-from googleapiclient.discovery import build
+from sib_tools.google.auth import get_service
 import logging
 import json
 
@@ -14,6 +13,21 @@ CONTACTS_SCOPES = [
 
 GOOGLE_CONTACTS_MEMBER_LABEL = "Member"
 
+# Maximum number of people per people.getBatchGet call
+BATCH_GET_SIZE = 200
+
+# The fields contact_to_canonical reads
+CANONICAL_PERSON_FIELDS = "names,emailAddresses,userDefined,birthdays,phoneNumbers,metadata"
+RAW_PERSON_FIELDS = "names,emailAddresses,memberships,birthdays,biographies,metadata,relations,userDefined,phoneNumbers"
+
+# When set, contacts are read from the local mirror, see contacts_mirror.py.
+incremental_fetch = False
+
+
+def enable_incremental_fetch(enabled: bool = True):
+    global incremental_fetch
+    incremental_fetch = enabled
+
 
 def contact_to_canonical(contact):
     primary_email = next((
@@ -89,55 +103,73 @@ def get_contact_group(service, group_name):
             return group
     return None
 
-def list_google_contacts(label_name=GOOGLE_CONTACTS_MEMBER_LABEL, raw=False, limit=None, offset=0):
-    creds = get_credentials(CONTACTS_SCOPES)
-    service = build("people", "v1", credentials=creds)
+def list_contact_group_member_names(service, group) -> list[str]:
+    """
+    Returns the resource names of the people in the contact group.
+    """
+    max_members = max(group.get("memberCount", 0), 1)
+    result = service.contactGroups().get(
+        resourceName=group["resourceName"],
+        maxMembers=max_members,
+    ).execute()
+    return result.get("memberResourceNames", [])
+
+def get_people(service, resource_names: list[str], person_fields: str) -> list[dict]:
+    """
+    Fetch the given people with people.getBatchGet, in the order of resource_names.
+    """
+    people = []
+    for start in range(0, len(resource_names), BATCH_GET_SIZE):
+        chunk = resource_names[start : start + BATCH_GET_SIZE]
+        result = service.people().getBatchGet(
+            resourceNames=chunk,
+            personFields=person_fields,
+        ).execute()
+
+        for response in result.get("responses", []):
+            person = response.get("person")
+            if person is None:
+                print(
+                    f"Warning: could not fetch contact {response.get('requestedResourceName')}: "
+                    f"{json.dumps(response.get('status'))}"
+                )
+                continue
+            people.append(person)
+
+    return people
+
+def list_google_contacts(label_name=GOOGLE_CONTACTS_MEMBER_LABEL, raw=False, limit=None, offset=0, service=None):
+    if service is None:
+        service = get_service("people", "v1", CONTACTS_SCOPES)
 
     print(f"Fetching contacts with label '{label_name}' from Google People API...")
-    # Get all contact groups (labels)
     member_group = get_contact_group(service, label_name)
     if not member_group:
         raise Exception(f"No Google Contact group with label '{label_name}' found.")
 
-    member_group_id = member_group["resourceName"]
-    # List all contacts (connections) using the People API
-    contacts = []
-    page_token = None
-    while True:
-        connections_result = service.people().connections().list(
-            resourceName="people/me",
-            personFields="names,emailAddresses,memberships,birthdays,biographies,metadata,relations,userDefined",
-            pageSize=1000,
-            pageToken=page_token
-        ).execute()
-        connections = connections_result.get("connections", [])
-        contacts.extend(connections)
-        page_token = connections_result.get("nextPageToken")
-        if not page_token:
-            break
-    print(f"Found {len(contacts)} contacts in total.")
-    member_contacts = []
-    for person in contacts:
-        memberships = person.get("memberships", [])
-        if any(
-            m.get("contactGroupMembership", {}).get("contactGroupResourceName") == member_group_id
-            for m in memberships
-        ):
-            member_contacts.append(person)
-    print(f"Found {len(member_contacts)} contacts with label '{label_name}'.")
-
-    # Apply offset and limit
-    member_contacts = member_contacts[offset:offset+limit] if limit is not None else member_contacts[offset:]
+    if incremental_fetch:
+        from .contacts_mirror import list_group_people
 
-    if raw:
-        return member_contacts
+        member_contacts = list_group_people(service, member_group["resourceName"])
+        print(f"Found {len(member_contacts)} contacts with label '{label_name}'.")
+
+        # Apply offset and limit
+        member_contacts = member_contacts[offset:offset+limit] if limit is not None else member_contacts[offset:]
     else:
-        return [contact_to_canonical(contact) for contact in member_contacts if contact.get("names")]
+        # Only fetch the people with the label, instead of all connections
+        resource_names = list_contact_group_member_names(service, member_group)
+        print(f"Found {len(resource_names)} contacts with label '{label_name}'.")
 
-    # for contact in member_contacts:
-    #     names = contact.get("names", [])
-    #     displayname = names[0]["displayName"] if names else "(No Name)"
+        # Apply offset and limit
+        resource_names = resource_names[offset:offset+limit] if limit is not None else resource_names[offset:]
 
-    #     canonical_contact = contact_to_canonical(contact)
-    #     # print(f"Contact {displayname}: {json.dumps(canonical_contact, indent=2)}")
+        member_contacts = get_people(
+            service,
+            resource_names,
+            RAW_PERSON_FIELDS if raw else CANONICAL_PERSON_FIELDS,
+        )
 
+    if raw:
+        return member_contacts
+    else:
+        return [contact_to_canonical(contact) for contact in member_contacts if contact.get("names")]
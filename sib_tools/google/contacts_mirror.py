@@ -0,0 +1,156 @@
+"""
+Local mirror of the Google Contacts of the account, kept up to date with
+People API sync tokens.
+
+The first run lists all connections and stores them, together with the sync
+token Google returns. Later runs pass that token, so Google only returns the
+contacts added, changed or deleted since. Sync tokens expire after seven days;
+the People API then answers 400 FAILED_PRECONDITION with reason
+EXPIRED_SYNC_TOKEN (older responses used 410 Gone), and the mirror is rebuilt
+with a full listing.
+
+The mirror holds personal data of members, so it is stored in the home
+directory, readable only by the user, like the other local caches.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+MIRROR_FILE = Path("~/.sib_google_contacts_mirror.json").expanduser()
+
+# contact_to_canonical's fields, plus the labels to filter on
+MIRROR_PERSON_FIELDS = "names,emailAddresses,userDefined,birthdays,phoneNumbers,metadata,memberships"
+
+lock = threading.Lock()
+
+
+def load_mirror(path: Path = MIRROR_FILE) -> dict:
+    if not path.exists():
+        return {}
+
+    try:
+        with path.open("r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read Google Contacts mirror {path}, rebuilding it: {e}")
+        return {}
+
+
+def save_mirror(mirror: dict, path: Path = MIRROR_FILE):
+    tmp_path = path.with_suffix(".tmp")
+    # Contains personal data of members, so never readable by others
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(mirror, f)
+    os.replace(tmp_path, path)
+
+
+def is_expired_sync_token(e: HttpError) -> bool:
+    if e.resp.status == 410:
+        return True
+    if e.resp.status != 400:
+        return False
+
+    details = [e.reason, e.error_details, e.content]
+    return any("EXPIRED_SYNC_TOKEN" in str(detail) for detail in details)
+
+
+def list_connections(service, person_fields: str, sync_token: str | None = None):
+    """
+    Returns the connections (or, with a sync token, the changed connections)
+    and the sync token for the next call.
+    """
+    people = []
+    page_token = None
+    while True:
+        kwargs = {
+            "resourceName": "people/me",
+            "personFields": person_fields,
+            "pageSize": 1000,
+            "requestSyncToken": True,
+        }
+        if sync_token:
+            kwargs["syncToken"] = sync_token
+        if page_token:
+            kwargs["pageToken"] = page_token
+
+        result = service.people().connections().list(**kwargs).execute()
+        people.extend(result.get("connections", []))
+
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            return people, result.get("nextSyncToken")
+
+
+def sync_mirror(service, path: Path = MIRROR_FILE) -> dict[str, dict]:
+    """
+    Bring the mirror up to date, and return all mirrored people by resource
+    name.
+    """
+    with lock:
+        mirror = load_mirror(path)
+        sync_token = mirror.get("sync_token")
+        people: dict[str, dict] = mirror.get("people", {})
+
+        if mirror.get("person_fields") != MIRROR_PERSON_FIELDS:
+            sync_token = None
+
+        changed = None
+        if sync_token:
+            try:
+                changed, next_token = list_connections(
+                    service, MIRROR_PERSON_FIELDS, sync_token
+                )
+            except HttpError as e:
+                if not is_expired_sync_token(e):
+                    raise
+                logger.info("Google Contacts sync token expired, doing a full resync.")
+
+        if changed is None:
+            fetched, next_token = list_connections(service, MIRROR_PERSON_FIELDS)
+            people = {person["resourceName"]: person for person in fetched}
+            logger.info(f"Google Contacts mirror (full): {len(people)} contacts")
+        else:
+            removed = 0
+            for person in changed:
+                if person.get("metadata", {}).get("deleted"):
+                    removed += people.pop(person["resourceName"], None) is not None
+                else:
+                    people[person["resourceName"]] = person
+            logger.info(
+                f"Google Contacts mirror (incremental): {len(changed) - removed} "
+                f"changed, {removed} removed"
+            )
+
+        save_mirror(
+            {
+                "person_fields": MIRROR_PERSON_FIELDS,
+                "sync_token": next_token,
+                "people": people,
+            },
+            path,
+        )
+        return people
+
+
+def list_group_people(service, group_resource_name: str, path: Path = MIRROR_FILE) -> list[dict]:
+    """
+    Returns the mirrored people that have the given contact group.
+    """
+    return [
+        person
+        for person in sync_mirror(service, path).values()
+        if any(
+            m.get("contactGroupMembership", {}).get("contactGroupResourceName")
+            == group_resource_name
+            for m in person.get("memberships", [])
+        )
+    ]
@@ -1,6 +1,10 @@
 import os
-from .constants import api_url
+import logging
+import threading
+from time import sleep
+from .constants import api_url, requests_per_second, request_burst, max_retries
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import keyring
 import keyring.errors
@@ -9,9 +13,20 @@ import urllib.parse
 from dotenv import load_dotenv
 from typing import Any
 
+from ..rate_limit import TokenBucket
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 laposta_api_key = None
+laposta_api_key_lock = threading.Lock()
+
+# All Laposta calls share one connection pool and one request budget, also
+# when they are made from several threads.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_maxsize=10))
+rate_limiter = TokenBucket(requests_per_second, capacity=request_burst)
 
 
 def prompt_credentials():
@@ -41,25 +56,63 @@ def get_laposta_api_key() -> str:
     global laposta_api_key
 
     if laposta_api_key is None:
-        return authenticate()
+        with laposta_api_key_lock:
+            if laposta_api_key is None:
+                return authenticate()
 
     return laposta_api_key
 
 
-def laposta_get(url : str, parameters = None) -> dict:
+def get_retry_delay(attempt: int, response: requests.Response) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+
+    return 2.0 * (2 ** attempt)
+
+
+def laposta_request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Do a request to the Laposta API within the shared rate budget. When
+    Laposta answers 429, the budget is reduced and the request is retried
+    after the indicated delay.
+    """
     api_key = get_laposta_api_key()
+    kwargs.setdefault("timeout", (10, 120))
+
+    attempt = 0
+    while True:
+        rate_limiter.acquire()
+        response = session.request(
+            method,
+            f"{api_url.removesuffix('/')}/{url.removeprefix('/')}",
+            auth=(api_key, ""),
+            **kwargs,
+        )
+
+        if response.status_code != 429 or attempt >= max_retries:
+            if response.status_code != 429:
+                rate_limiter.succeeded()
+            return response
+
+        delay = get_retry_delay(attempt, response)
+        logger.warning(
+            f"Laposta rate limit hit on {method} {url}, retrying in {delay:.1f}s"
+        )
+        rate_limiter.slow_down(pause=delay)
+        sleep(delay)
+        attempt += 1
+
 
+def laposta_get(url : str, parameters = None) -> dict:
     if parameters is not None:
         parameters = urllib.parse.urlencode(parameters)
         url += "?" + parameters
 
-    response = requests.get(
-        f"{api_url.removesuffix('/')}/{url.removeprefix('/')}",
-        auth=(
-            api_key,
-            ""
-        ),
-    )
+    response = laposta_request("GET", url)
     return response.json()
 
 def make_form_flattened(body : dict[str, Any]) -> dict[str, Any]:
@@ -91,51 +144,42 @@ def make_form_flattened(body : dict[str, Any]) -> dict[str, Any]:
 
 
 def laposta_post(url : str, body : dict[str, Any]) -> dict[str, Any]:
-    api_key = get_laposta_api_key()
-
     # Flatten body, we need keys like 'custom_fields[prefs][]=optionA'
     body_flat = make_form_flattened(body)
-    print("Flattened body for POST:", json.dumps(body_flat, indent=2))
+    logger.debug(f"Flattened body for POST: {json.dumps(body_flat, indent=2)}")
 
-    response = requests.post(
-        f"{api_url}/{url.removeprefix('/')}",
+    response = laposta_request(
+        "POST",
+        url,
         headers={
             "Content-Type": "application/x-www-form-urlencoded",
             "Accept": "application/json",
         },
-        auth=(
-            api_key,
-            ""
-        ),
         data=body_flat,
     )
     return response.json()
 
-def laposta_delete(url : str) -> dict:
-    api_key = get_laposta_api_key()
-
-    response = requests.delete(
-        f"{api_url}/{url.removeprefix('/')}",
-        auth=(
-            api_key,
-            ""
-        ),
+def laposta_post_json(url : str, body : dict[str, Any]) -> dict[str, Any]:
+    response = laposta_request(
+        "POST",
+        url,
+        headers={"Accept": "application/json"},
+        json=body,
     )
     return response.json()
 
-def laposta_patch(url : str, body : dict[str, Any]) -> dict[str, Any]:
-    api_key = get_laposta_api_key()
+def laposta_delete(url : str) -> dict:
+    response = laposta_request("DELETE", url)
+    return response.json()
 
-    response = requests.patch(
-        f"{api_url}/{url.removeprefix('/')}",
+def laposta_patch(url : str, body : dict[str, Any]) -> dict[str, Any]:
+    response = laposta_request(
+        "PATCH",
+        url,
         headers={
             "Content-Type": "application/x-www-form-urlencoded",
             "Accept": "application/json",
         },
-        auth=(
-            api_key,
-            ""
-        ),
         data=body,
     )
     return response.json()
@@ -7,3 +7,9 @@ member_newsletter_list_id = "s0j3zv9wry"
 alumni_birthday_list_id = "luwhwmlq4d"
 test_list_id = "szktmg1wta"
 possible_relation_states = ["active", "unsubscribed", "unconfirmed", "cleaned"]
+
+# Request budget for the Laposta API. Kept conservative; on a 429 the rate is
+# halved and recovers gradually (see sib_tools.rate_limit.TokenBucket).
+requests_per_second = 2.0
+request_burst = 4
+max_retries = 5
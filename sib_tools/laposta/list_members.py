@@ -1,5 +1,6 @@
 import json
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable
 
 from ..laposta.auth import (
     laposta_get,
@@ -8,7 +9,6 @@ from ..laposta.auth import (
     laposta_delete,
 )
 from ..canonical import canonical_key
-from ..canonical.canonical_key import flatten_dict
 from .constants import (
     account_id,
     member_birthday_list_id,
@@ -35,21 +35,7 @@ def get_list_members_raw(list_id):
 
 
 def relation_to_canonical(relation):
-    canonical = dict()
-
-    to_canonical = canonical_key.get_laposta_to_key()
-
-    flattened_relation = flatten_dict(relation)
-
-    for key, value in flattened_relation.items():
-        new_key = to_canonical.get(key, None)
-
-        if new_key is not None:
-            canonical[new_key] = value
-            continue
-
-        other = canonical.setdefault("other", dict())
-        other[key] = value
+    canonical = canonical_key.get_schema().to_canonical("Laposta", relation)
 
     canonical["laposta_state"] = relation["state"]
     if "date_of_birth" in canonical:
@@ -63,34 +49,52 @@ def get_list_members(list_id):
     return [relation_to_canonical(member) for member in members]
 
 
-def get_aggregated_relations():
-    member_newsletter_members = get_list_members(member_newsletter_list_id)
-    sleep(1.5)
-
-    member_birthday_members = get_list_members(member_birthday_list_id)
-    sleep(1.5)
-
-    alumni_birthday_members = get_list_members(alumni_birthday_list_id)
+# Role of each list in the aggregated relations. The order is the order in
+# which e-mail addresses are reported.
+LIST_ROLES = {
+    member_birthday_list_id: "birthday",
+    member_newsletter_list_id: "newsletter",
+    alumni_birthday_list_id: "birthday_alumnus",
+}
+
+
+def get_aggregated_relations(list_ids: Iterable[str] | None = None, max_workers: int = 4):
+    """
+    Fetch the given Laposta lists (by default those in LIST_ROLES) and combine
+    their subscriptions per e-mail address.
+
+    The lists are fetched concurrently, within the rate budget of
+    laposta.auth, and each list is merged into the by-email index as soon as
+    it arrives.
+    """
+    list_ids = list(dict.fromkeys(LIST_ROLES if list_ids is None else list_ids))
+    list_order = {
+        list_id: i
+        for i, list_id in enumerate(
+            [l for l in LIST_ROLES if l in list_ids]
+            + [l for l in list_ids if l not in LIST_ROLES]
+        )
+    }
 
     by_email = dict()
+    # (list order, position in list) of the first appearance of each address,
+    # so the result does not depend on which response arrives first
+    first_seen = dict()
 
-    for member in member_birthday_members:
-        email_obj = by_email.setdefault(member["email"], dict())
-        email_obj["birthday"] = member
-
-        # active = member["laposta_state"] == "active"
-        # print(json.dumps(member, indent=2))
-
-    for member in member_newsletter_members:
-        email_obj = by_email.setdefault(member["email"], dict())
-        email_obj["newsletter"] = member
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(list_ids)))) as executor:
+        futures = {
+            executor.submit(get_list_members, list_id): list_id for list_id in list_ids
+        }
+        for future in as_completed(futures):
+            list_id = futures[future]
+            role = LIST_ROLES.get(list_id, list_id)
 
-        # active = member["laposta_state"] == "active"
-        # print(json.dumps(member, indent=2))
+            for position, member in enumerate(future.result()):
+                email_obj = by_email.setdefault(member["email"], dict())
+                email_obj[role] = member
 
-    for relation in alumni_birthday_members:
-        email_obj = by_email.setdefault(relation["email"], dict())
-        email_obj["birthday_alumnus"] = relation
+                seen = (list_order[list_id], position)
+                first_seen[member["email"]] = min(first_seen.get(member["email"], seen), seen)
 
     def transform_by_email_entry(entry: dict) -> dict:
         newsletter: dict | None = entry.get("newsletter", None)
@@ -98,7 +102,7 @@ def get_aggregated_relations():
         birthday_alumnus: dict | None = entry.get("birthday_alumnus", None)
 
         base = {
-            "email": (newsletter or birthday or birthday_alumnus)["email"],
+            "email": next(iter(entry.values()))["email"],
             "send_birthday": False,
             "send_newsletter": False,
             "send_birthday_alumnus": False,
@@ -153,6 +157,18 @@ def get_aggregated_relations():
                 "conscribo_id", None
             ) or base.get("conscribo_id")
 
+        # Lists without a known role are only reported by their member id
+        for list_id in list_ids:
+            if list_id in LIST_ROLES or list_id not in entry:
+                continue
+
+            base["laposta_member_ids"][list_id] = entry[list_id].get(
+                "laposta_member_id", None
+            )
+            base.setdefault("other_subscription_states", dict())[list_id] = entry[
+                list_id
+            ].get("laposta_state", None)
+
         first_names -= {None}
         last_names -= {None}
 
@@ -166,7 +182,8 @@ def get_aggregated_relations():
 
     entries = []
 
-    for k, v in by_email.items():
+    for k in sorted(by_email.keys(), key=lambda email: first_seen[email]):
+        v = by_email[k]
         # print(k)
         # print(json.dumps(v, indent=2))
         transformed = transform_by_email_entry(v)
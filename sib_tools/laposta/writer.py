@@ -0,0 +1,148 @@
+"""
+Sends the mutations of a Laposta sync.
+
+The mutations of one e-mail address are done in order (a re-add removes the
+subscription before adding it again), but different addresses are handled
+concurrently. All requests share the rate budget of laposta.auth, so the
+concurrency only fills the budget instead of exceeding it.
+
+Optionally, additions are sent through Laposta's bulk endpoint, which upserts
+many members of a list in one request.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from . import auth
+
+DEFAULT_WORKERS = 4
+
+# Members per bulk request
+BULK_BATCH_SIZE = 500
+
+use_bulk_upsert = False
+
+
+def enable_bulk_upsert(enabled: bool = True):
+    global use_bulk_upsert
+    use_bulk_upsert = enabled
+
+
+@dataclass
+class Mutation:
+    method: str
+    url: str
+    list_id: str
+    payload: dict[str, Any] | None = None
+
+
+@dataclass
+class MemberMutations:
+    email: str
+    mutations: list[Mutation] = field(default_factory=list)
+    responses: list[tuple[Mutation, Any]] = field(default_factory=list)
+
+
+def send_mutation(mutation: Mutation) -> Any:
+    if mutation.method == "DELETE":
+        return auth.laposta_delete(mutation.url)
+
+    if mutation.method == "POST":
+        assert mutation.payload is not None
+        return auth.laposta_post(mutation.url, mutation.payload)
+
+    raise ValueError(f"Unsupported Laposta mutation: {mutation.method}")
+
+
+def send_member_mutations(member: MemberMutations):
+    for mutation in member.mutations:
+        try:
+            response = send_mutation(mutation)
+        except Exception as e:
+            response = {"error": repr(e)}
+        member.responses.append((mutation, response))
+
+
+def to_bulk_member(payload: dict[str, Any]) -> dict[str, Any]:
+    return {
+        k: v for k, v in payload.items() if k not in ("list_id", "options", "ip")
+    }
+
+
+def bulk_upsert(
+    list_id: str, payloads: list[dict[str, Any]], logger: logging.Logger
+) -> int:
+    """
+    Add or update the given members of a list through the bulk endpoint.
+    Returns the number of members Laposta reported an error for.
+    """
+    errors = 0
+    for start in range(0, len(payloads), BULK_BATCH_SIZE):
+        batch = payloads[start : start + BULK_BATCH_SIZE]
+        response = auth.laposta_post_json(
+            f"/v2/list/{list_id}/members",
+            {
+                "mode": "add_and_edit",
+                "members": [to_bulk_member(p) for p in batch],
+            },
+        )
+
+        logger.debug(
+            f"Bulk upsert of {len(batch)} members to list {list_id}: "
+            f"{json.dumps(response.get('report', response))}"
+        )
+
+        if "error" in response:
+            logger.error(f"Bulk upsert to list {list_id} failed: {json.dumps(response['error'])}")
+            errors += len(batch)
+            continue
+
+        for member in response.get("members", None) or []:
+            if member.get("error") is not None:
+                errors += 1
+                logger.error(f"  Bulk upsert error: {json.dumps(member)}")
+
+    return errors
+
+
+def apply_mutations(
+    members: list[MemberMutations],
+    logger: logging.Logger,
+    workers: int = DEFAULT_WORKERS,
+    bulk: bool | None = None,
+):
+    """
+    Send the mutations of all members, and log the responses in the order of
+    the members.
+    """
+    if bulk is None:
+        bulk = use_bulk_upsert
+
+    bulk_payloads: dict[str, list[dict[str, Any]]] = {}
+    if bulk:
+        # Removals are still sent one by one, before the bulk additions
+        for member in members:
+            for mutation in member.mutations:
+                if mutation.method == "POST" and mutation.payload is not None:
+                    bulk_payloads.setdefault(mutation.list_id, []).append(mutation.payload)
+
+            member.mutations = [m for m in member.mutations if m.method != "POST"]
+
+    pending = [member for member in members if member.mutations]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(send_member_mutations, pending))
+
+    for member in pending:
+        for mutation, response in member.responses:
+            logger.debug(f"{mutation.method} {mutation.url} for {member.email}")
+            logger.debug(f"Response: {json.dumps(response)}")
+            if isinstance(response, dict) and "error" in response:
+                logger.error(
+                    f"  Laposta {mutation.method} for {member.email} failed: {json.dumps(response['error'])}"
+                )
+
+    for list_id, payloads in bulk_payloads.items():
+        bulk_upsert(list_id, payloads, logger)
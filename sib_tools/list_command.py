@@ -3,27 +3,11 @@ from argparse import ArgumentParser, Namespace
 import sys
 from sib_tools.conscribo.relations import list_relations_alumnus, list_relations_members, list_relations_active_members
 import json
-import beaupy
-from unidecode import unidecode
-from time import sleep
+import textwrap
 from datetime import datetime, date, timezone
 
-
-from sib_tools.conscribo.finance import (
-    list_conscribo_transactions,
-    list_conscribo_accounts,
-)
-from sib_tools.conscribo.list_accounts import (
-    show_choose_account,
-    print_list_accounts,
-    build_account_options,
-)
-from sib_tools.google.auth import (
-    list_groups_directory_api,
-    list_groups_settings_api,
-    list_group_members_api,
-)
-from sib_tools.sib_app.wp_old_users import fetch_users
+# Imports of other services are done in the handlers, so that listing one
+# resource does not load the clients of all others.
 
 
 #  ./sib-tools.sh list conscribo-transactions 2025-01-01 2025-07-07
@@ -55,6 +39,8 @@ def handle_list_members(args: Namespace):
 
 def handle_list_education(args: Namespace):
     """List educational institution counts among members."""
+    from unidecode import unidecode
+
     active_date = args.date or date.today().isoformat()
 
     print(f"Showing educational institution counts for active members as of {active_date}")
@@ -185,6 +171,8 @@ def handle_list_education(args: Namespace):
 
 
 def handle_list_accounts(args: Namespace):
+    from sib_tools.conscribo.list_accounts import print_list_accounts
+
     print_list_accounts(
         date=args.date,
         raw=args.raw,
@@ -192,6 +180,10 @@ def handle_list_accounts(args: Namespace):
 
 
 def handle_list_transactions(args: Namespace):
+    import beaupy
+    from sib_tools.conscribo.finance import iter_conscribo_transactions
+    from sib_tools.conscribo.list_accounts import show_choose_account
+
     account_id = args.account_id
     if not account_id:
         answer = beaupy.confirm(
@@ -203,70 +195,46 @@ def handle_list_transactions(args: Namespace):
                 print("No account selected. Exiting.")
                 return
     print(
-        f"Listing Conscribo transactions from {args.start_date} to {args.end_date} for account {account_id}"
+        f"Listing Conscribo transactions from {args.start_date} to {args.end_date} for account {account_id}",
+        file=sys.stderr,
     )
-    transactions = list_conscribo_transactions(
+    # Print each transaction as it arrives, as JSON Lines (one transaction per
+    # line), so the output stays valid when interrupted. Messages go to stderr.
+    count = 0
+    for tx in iter_conscribo_transactions(
         args.start_date,
         args.end_date,
         account_id,
-        limit=args.limit,
         offset=args.offset,
-    )
-    print(json.dumps(transactions, indent=2))
+        limit=args.limit,
+    ):
+        print(json.dumps(tx), flush=True)
+        count += 1
     print(
-        f"Showing filter results {args.offset + 1} to {args.offset + len(transactions)}"
+        f"Showing filter results {args.offset + 1} to {args.offset + count}",
+        file=sys.stderr,
     )
-    if len(transactions) == args.limit:
+    if count == args.limit:
         print(
-            f"Use --offset {args.offset + args.limit} to get the next page of results."
+            f"Use --offset {args.offset + args.limit} to get the next page of results.",
+            file=sys.stderr,
         )
     else:
-        print("No more results available.")
+        print("No more results available.", file=sys.stderr)
 
 
 def handle_list_balance_diff(args: Namespace):
+    from sib_tools.conscribo.finance import list_conscribo_accounts
+    from sib_tools.conscribo.transaction_store import get_balance_diff
+    from sib_tools.conscribo.list_accounts import build_account_options
+
     print(f"Calculating balance difference from {args.start_date} to {args.end_date}")
-    debet_per_account = dict()
-    credit_per_account = dict()
-    account_id = None
     fetch_date = datetime.now(timezone.utc).isoformat()
 
-    offset = 0
-    limit = 100
-    while True:
-        transactions = list_conscribo_transactions(
-            args.start_date,
-            args.end_date,
-            account_id,
-            limit=limit,
-            offset=offset,
-        )["transactions"].values()
-
-        for tx in transactions:
-            transactionId = tx["transactionId"]
-            date = tx["date"]
-            tx_description = tx.get("description", "")
-
-            for rowId, row in tx.get("transactionRows", {}).items():
-                account = row["accountNr"]
-                row_description = row.get("description", "")
-
-                if row["side"] == "debet":
-                    debet_per_account[account] = debet_per_account.get(
-                        account, 0
-                    ) + float(row["amount"])
-                elif row["side"] == "credit":
-                    credit_per_account[account] = credit_per_account.get(
-                        account, 0
-                    ) + float(row["amount"])
-
-        if len(transactions) < limit:
-            print("No more transactions available.")
-            break
-
-        offset += limit
-        print(f"Processed {offset} transactions")
-        sleep(1)
+    # Only the dates that are not in the local transaction store are fetched
+    debet_per_account, credit_per_account = get_balance_diff(
+        args.start_date, args.end_date, refresh=args.refresh
+    )
 
     if args.output:
         print(f"Storing results to {args.output}...")
@@ -281,6 +249,7 @@ def handle_list_balance_diff(args: Namespace):
                 },
                 f,
                 indent=2,
+                default=float,
             )
         print("Results stored to balance_diff.json")
 
@@ -295,6 +264,7 @@ def handle_list_balance_diff(args: Namespace):
                     "credit_per_account": credit_per_account,
                 },
                 indent=2,
+                default=float,
             )
         )
         return
@@ -350,6 +320,8 @@ def handle_list_balance_diff(args: Namespace):
 
 def handle_list_google_groups_directory(args: Namespace):
     """List Google Groups using the Directory API and print as JSON."""
+    from sib_tools.google.auth import list_groups_directory_api
+
     groups = list_groups_directory_api()
     print(json.dumps(groups, indent=2))
     print()
@@ -357,12 +329,20 @@ def handle_list_google_groups_directory(args: Namespace):
 
 def handle_list_google_groups_settings(args: Namespace):
     """List Google Groups using the Groups Settings API and print as JSON."""
-    groups = list_groups_settings_api()
-    print(json.dumps(groups, indent=2))
+    from sib_tools.google.auth import iter_groups_settings_api
+
+    # Print each group as soon as it arrives, as one JSON array
+    separator = "[\n"
+    for settings in iter_groups_settings_api():
+        print(separator + textwrap.indent(json.dumps(settings, indent=2), "  "), end="", flush=True)
+        separator = ",\n"
+    print("[]" if separator == "[\n" else "\n]")
     print()
 
 
 def handle_list_google_groups_members(args: Namespace):
+    from sib_tools.google.auth import list_group_members_api
+
     emails = args.email or ["members@sib-utrecht.nl", "alumni@sib-utrecht.nl"]
     if isinstance(emails, str):
         emails = [emails]
@@ -408,6 +388,8 @@ def handle_list_google_contacts(args: Namespace):
 
 def handle_list_sib_app_users(args: Namespace):
     """List users from SIB App (WordPress) via the sib_app API."""
+    from sib_tools.sib_app.wp_old_users import fetch_users
+
     users = fetch_users(args.min_wp_user_id)
     print(json.dumps(users, indent=2))
     print()
@@ -484,7 +466,7 @@ def add_parse_args(parser: ArgumentParser):
 
     transactions_parser = subparser.add_parser(
         "conscribo-transactions",
-        help="List Conscribo transactions for an account and date range",
+        help="List Conscribo transactions for an account and date range, as JSON Lines (one transaction per line)",
     )
     transactions_parser.add_argument(
         "start_date", type=str, help="Start date (YYYY-MM-DD)"
@@ -492,7 +474,9 @@ def add_parse_args(parser: ArgumentParser):
     transactions_parser.add_argument("end_date", type=str, help="End date (YYYY-MM-DD)")
     transactions_parser.add_argument("--account-id", type=str, help="Account ID")
     transactions_parser.add_argument(
-        "--limit", type=int, help="Limit the number of transactions returned"
+        "--limit",
+        type=int,
+        help="Limit the number of transactions returned (default: no limit, all pages of the date range are fetched)",
     )
     transactions_parser.add_argument(
         "--offset", type=int, default=0, help="Offset for pagination (default: 0)"
@@ -519,6 +503,11 @@ def add_parse_args(parser: ArgumentParser):
         default=None,
         help="Output file to store the balance difference results",
     )
+    balance_diff_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Download the transactions of the date range again, instead of using the local transaction store",
+    )
     balance_diff_parser.set_defaults(func=handle_list_balance_diff)
 
     # New: List users from SIB App (WordPress)
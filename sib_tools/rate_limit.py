@@ -0,0 +1,72 @@
+"""
+Thread-safe token bucket, shared by the clients of rate-limited APIs.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to
+    `capacity` requests. acquire() blocks until a token is available.
+
+    The rate adapts to the server: slow_down() halves it (and can pause all
+    callers for a while, e.g. after a 429 with Retry-After), and every
+    successful request lets it recover towards the configured rate.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float | None = None,
+        min_rate: float | None = None,
+        recovery: float = 1.2,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.recovery = recovery
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                else:
+                    wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def slow_down(self, pause: float = 0.0):
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            # Concurrent requests that hit the same limit count only once
+            if now >= self.paused_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            if pause > 0:
+                self.paused_until = max(self.paused_until, now + pause)
+
+    def succeeded(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * self.recovery)
@@ -6,7 +6,7 @@ from time import sleep
 from sib_tools.utils import increase_indent, print_change_count, print_header
 
 from ..conscribo.relations import list_relations_members
-from ..conscribo.groups import list_entity_groups
+from ..conscribo.groups import list_entity_groups, group_index
 from ..conscribo.groups import add_relations_to_group, remove_relations_from_group
 
 from ..canonical import canonical_key
@@ -15,13 +15,14 @@ from ..cognito.list_users import (
     list_all_cognito_users,
     cognito_user_to_canonical,
     canonical_to_cognito_user,
-    cognito_client,
+    get_cognito_client,
     user_pool_id,
 )
 from ..cognito.groups import (
     cognito_list_groups,
     cognito_list_users_in_group,
     cognito_list_users_in_group_canonical,
+    load_group_members,
 )
 
 def sync_cognito_to_conscribo_groups(dry_run=True, logger: logging.Logger | None = None) -> int:
@@ -34,8 +35,10 @@ def sync_cognito_to_conscribo_groups(dry_run=True, logger: logging.Logger | None
 
     cognito_groups_by_name = {group["GroupName"]: group for group in cognito_groups}
     cognito_group_members = {
-        group["GroupName"]: cognito_list_users_in_group_canonical(group["GroupName"])
-        for group in cognito_groups
+        name: [cognito_user_to_canonical(user) for user in users]
+        for name, users in load_group_members(
+            [group["GroupName"] for group in cognito_groups]
+        ).items()
     }
 
     conscribo_groups = list_entity_groups()
@@ -50,7 +53,7 @@ def sync_cognito_to_conscribo_groups(dry_run=True, logger: logging.Logger | None
             "subgroups for each member group you need on Cognito (like 'admins')"
         )
 
-    subgroups = [a for a in conscribo_groups if a["parentId"] == accounts_group["id"]]
+    subgroups = group_index.get_children(accounts_group["id"])
     subgroups.sort(key=lambda x: x["name"])
 
     logger.info(f"Found {len(subgroups)} subgroups on Conscribo:")
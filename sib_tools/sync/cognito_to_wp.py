@@ -7,9 +7,10 @@ from typing import Any
 from time import sleep, time
 import json
 from ..cognito.client import (
-    cognito_client,
+    get_cognito_client,
     user_pool_id,
 )
+from ..cognito.directory import cognito_directory
 
 def sync_cognito_to_wp(dry_run: bool = True, logger: logging.Logger | None = None) -> int:
     """
@@ -110,10 +111,9 @@ def sync_cognito_to_wp(dry_run: bool = True, logger: logging.Logger | None = Non
 
             # Update Cognito user
             start_time = time()
-            cognito_client.admin_update_user_attributes(
-                UserPoolId=user_pool_id,
-                Username=canonical["cognito_sub"],
-                UserAttributes=[
+            cognito_directory.update_user_attributes(
+                canonical["cognito_sub"],
+                [
                     {
                         "Name": "custom:wp-userid",
                         "Value": str(wp_user_id),
@@ -1,4 +1,3 @@
-import boto3
 from time import sleep
 import json
 import logging
@@ -13,9 +12,11 @@ from ..cognito.list_users import (
     list_all_cognito_users,
     cognito_user_to_canonical,
     canonical_to_cognito_user,
-    cognito_client,
+    canonical_to_cognito_attributes,
+    get_cognito_client,
     user_pool_id,
 )
+from ..cognito.directory import cognito_directory
 from ..utils import print_change_count, print_header
 
 def sync_conscribo_to_cognito(
@@ -116,10 +117,7 @@ def sync_conscribo_to_cognito(
 
             cognito_sub = cognito_user["cognito_sub"]
 
-            cognito_client.admin_delete_user(
-                UserPoolId=user_pool_id,
-                Username=cognito_user["cognito_sub"],
-            )
+            cognito_directory.delete_user(cognito_user["cognito_sub"])
             logger.info(f"Deleted {conscribo_id} ({cognito_sub})")
 
     def create_users():
@@ -150,60 +148,74 @@ def sync_conscribo_to_cognito(
             if dry_run:
                 continue
 
-            cognito_client.admin_create_user(
-                UserPoolId=user_pool_id,
-                Username=cognito_user["Username"],
-                UserAttributes=cognito_user["Attributes"],
+            cognito_directory.create_user(
+                cognito_user["Username"],
+                cognito_user["Attributes"],
                 DesiredDeliveryMediums=["EMAIL"],
             )
 
-    def update_users():
-        nonlocal change_count
-        for conscribo_id in conscribo_by_id.keys():
-            cognito_user = cognito_by_id.get(conscribo_id, None)
-            conscribo_user = conscribo_by_id[conscribo_id]
+    def diff_attributes() -> list[tuple[str, dict, dict, list[dict]]]:
+        """
+        Returns (conscribo_id, cognito user, its current attribute values,
+        changed attributes) for every user whose Cognito attributes differ
+        from Conscribo, in one pass with the mapping looked up once.
+        """
+        to_cognito = canonical_key.get_schema().from_key["Cognito"]
 
+        updates = []
+        for conscribo_id, conscribo_user in conscribo_by_id.items():
+            cognito_user = cognito_by_id.get(conscribo_id, None)
             if cognito_user is None:
                 continue
 
-            old_attributes = canonical_to_cognito_user(cognito_user)["Attributes"]
-            old_attribute_values_by_name = {
-                attr["Name"]: attr["Value"] for attr in old_attributes
-            }
+            old_values = canonical_to_cognito_attributes(cognito_user, to_cognito)
+            new_values = canonical_to_cognito_attributes(conscribo_user, to_cognito)
 
-            # Update user attributes in Cognito based on Conscribo data
-            new_attributes = canonical_to_cognito_user(conscribo_user)["Attributes"]
+            changed = [
+                {"Name": name, "Value": value}
+                for name, value in new_values.items()
+                if old_values.get(name, "") != value
+            ]
+            if changed:
+                updates.append((conscribo_id, cognito_user, old_values, changed))
 
-            update_attributes = []
-            for attr in new_attributes:
-                prev_value = old_attribute_values_by_name.get(attr["Name"], "")
+        return updates
 
-                if prev_value == attr["Value"]:
-                    # logger.debug(f"Skipping unchanged attribute {attr['Name']} for {conscribo_id}")
-                    continue
+    def update_users():
+        nonlocal change_count
+
+        updates = diff_attributes()
+        for conscribo_id, cognito_user, old_values, update_attributes in updates:
+            for attr in update_attributes:
                 logger.info(
-                    f"Changed {attr['Name']}: {prev_value} -> {attr['Value']} for {conscribo_id}"
+                    f"Changed {attr['Name']}: {old_values.get(attr['Name'], '')} -> {attr['Value']} for {conscribo_id}"
                 )
 
-                update_attributes.append(attr)
-
-            if len(update_attributes) == 0:
-                continue
-
             # Count this as a single modification for the user
             change_count += 1
             logger.info(f"Updating attributes for {conscribo_id}: {update_attributes}")
-
-            cognito_sub = cognito_user["cognito_sub"]
             logger.info(f"UPDATE {conscribo_id} {json.dumps(update_attributes)}\n")
-            if dry_run:
-                continue
 
-            cognito_client.admin_update_user_attributes(
-                UserPoolId=user_pool_id,
-                Username=cognito_sub,
-                UserAttributes=new_attributes,
-            )
+        if dry_run:
+            return
+
+        # Only the changed attributes are sent, a few users at a time
+        errors = cognito_directory.update_many(
+            [
+                (cognito_user["cognito_sub"], update_attributes)
+                for _, cognito_user, _, update_attributes in updates
+            ]
+        )
+        failed = [
+            (conscribo_id, error)
+            for (conscribo_id, _, _, _), error in zip(updates, errors)
+            if error is not None
+        ]
+        for conscribo_id, error in failed:
+            logger.error(f"Failed to update attributes for {conscribo_id}: {error}")
+
+        if failed:
+            raise failed[0][1]
 
     prune_users()
     create_users()
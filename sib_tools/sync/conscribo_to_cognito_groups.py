@@ -1,24 +1,26 @@
-import boto3
-from time import sleep
 import json
 import logging
 import sys
 
 from ..conscribo.relations import list_relations_members
-from ..conscribo.groups import list_entity_groups
+from ..conscribo.groups import list_entity_groups, group_index
 from ..canonical import canonical_key
 from ..canonical.canonical_key import flatten_dict
 from ..cognito.list_users import (
     list_all_cognito_users,
     cognito_user_to_canonical,
     canonical_to_cognito_user,
-    cognito_client,
+    get_cognito_client,
     user_pool_id,
     list_cognito_users_canonical,
 )
 from ..cognito.groups import (
     cognito_list_groups,
     cognito_list_users_in_group,
+    load_group_members,
+    create_group,
+    add_user_to_group,
+    remove_user_from_group,
 )
 from ..utils import increase_indent, print_change_count, print_header
 
@@ -32,10 +34,9 @@ def sync_conscribo_to_cognito_groups(dry_run=True, logger: logging.Logger | None
         logger.info(f"Dry run: {dry_run}")
 
     cognito_groups_by_name = {group["GroupName"]: group for group in cognito_groups}
-    cognito_group_members = {
-        group["GroupName"]: cognito_list_users_in_group(group["GroupName"])
-        for group in cognito_groups
-    }
+    cognito_group_members = load_group_members(
+        [group["GroupName"] for group in cognito_groups]
+    )
 
     conscribo_groups = list_entity_groups()
     cognito_users = list_cognito_users_canonical()
@@ -54,7 +55,7 @@ def sync_conscribo_to_cognito_groups(dry_run=True, logger: logging.Logger | None
             "(like 'admins')"
         )
 
-    subgroups = [a for a in conscribo_groups if a["parentId"] == accounts_group["id"]]
+    subgroups = group_index.get_children(accounts_group["id"])
     subgroups.sort(key=lambda x: x["name"])
 
     logger.info(f"Found {len(subgroups)} subgroups on Conscribo:")
@@ -82,13 +83,9 @@ def sync_conscribo_to_cognito_groups(dry_run=True, logger: logging.Logger | None
             logger.info(f"Creating Cognito group: {group_name}")
             change_count += 1  # group creation counts as a change
             if not dry_run:
-                ans = cognito_client.create_group(
-                    GroupName=group_name,
-                    UserPoolId=user_pool_id,
-                )
-                logger.debug(json.dumps(ans, indent=2))
+                ans = create_group(group_name)
+                logger.debug(json.dumps(ans, indent=2, default=str))
                 logger.info(f"Created Cognito group: {ans['Group']}")
-                sleep(0.1)
                 cognito_group_members[group_name] = []
 
         cognito_members = [
@@ -137,16 +134,10 @@ def sync_conscribo_to_cognito_groups(dry_run=True, logger: logging.Logger | None
             if dry_run:
                 continue
 
-            res = cognito_client.admin_add_user_to_group(
-                UserPoolId=user_pool_id,
-                Username=username,
-                GroupName=group_name,
-            )
+            res = add_user_to_group(username, group_name)
             logger.debug("Response from Cognito API:")
             logger.debug(increase_indent(json.dumps(res, indent=2)))
 
-            sleep(0.1)
-
         for user_id in to_remove:
             found = False
             for cognito_member in cognito_members:
@@ -171,15 +162,9 @@ def sync_conscribo_to_cognito_groups(dry_run=True, logger: logging.Logger | None
                 if dry_run:
                     continue
 
-                res = cognito_client.admin_remove_user_from_group(
-                    UserPoolId=user_pool_id,
-                    Username=username,
-                    GroupName=group_name,
-                )
+                res = remove_user_from_group(username, group_name)
                 logger.debug("Response from Cognito API:")
                 logger.debug(increase_indent(json.dumps(res, indent=2)))
-
-                sleep(0.1)
             if not found:
                 logger.warning(
                     f"User {user_id} not found in Cognito users, skipping. "
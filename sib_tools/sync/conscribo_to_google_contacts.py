@@ -2,11 +2,9 @@
 Sync Conscribo members to Google Contacts, only considering contacts with label 'Member'.
 """
 
-from sib_tools.google.auth import get_credentials
-from googleapiclient.discovery import build
+from sib_tools.google.auth import get_service
 import logging
 import json
-from time import sleep
 from ..google.contacts import (
     list_google_contacts,
     get_contact_group,
@@ -85,12 +83,20 @@ Vincent Kuhlmann
 """
 
 
+# Limits of the People API batch endpoints
+CREATE_BATCH_SIZE = 200  # also below the 1000 of contactGroups.members.modify
+DELETE_BATCH_SIZE = 500
+
 ANON_MIN_AVAILABILITY = 20
 ANON_BLOCK_SIZE = 300
 
 ANON_NUMBER_FILE = Path(__file__).parent.parent.parent / "anon_number.json"
 
-def get_fresh_anon_number():
+def get_fresh_anon_numbers(count: int) -> list[int]:
+    """
+    Reserve count anonymous numbers, reading and writing anon_number.json
+    only once.
+    """
     if not ANON_NUMBER_FILE.exists():
         print("Warning: anon_number.json does not exist, creating new file.")
 
@@ -114,36 +120,38 @@ def get_fresh_anon_number():
     if not expired:
         available = data.get("available", [])
 
-    if len(available) < ANON_MIN_AVAILABILITY:
-        start = data.get("next_start", 200)
-        new_available = list(range(start, start + ANON_BLOCK_SIZE))
-        available.extend(new_available)
-        data["next_start"] = start + ANON_BLOCK_SIZE
-        data["available_expiry"] = (date.today() + timedelta(days=30*10)).isoformat()
+    numbers = []
+    for _ in range(count):
+        if len(available) < ANON_MIN_AVAILABILITY:
+            start = data.get("next_start", 200)
+            new_available = list(range(start, start + ANON_BLOCK_SIZE))
+            available.extend(new_available)
+            data["next_start"] = start + ANON_BLOCK_SIZE
+            data["available_expiry"] = (date.today() + timedelta(days=30*10)).isoformat()
+
+        choice = randint(0, len(available) - 1)
+        numbers.append(available.pop(choice))
 
-    choice = randint(0, len(available) - 1)
-    number = available.pop(choice)
     data["available"] = available
 
     with ANON_NUMBER_FILE.open("w") as f:
         json.dump(data, f)
 
-    return number
+    return numbers
+
+
+def get_fresh_anon_number():
+    return get_fresh_anon_numbers(1)[0]
 
 
-def do_add(contact, logger: logging.Logger, dry_run: bool, service, group):
+def build_contact(member: dict, anon_number: int) -> dict:
+    """
+    Returns the People API person for a new member contact.
+    """
     today = datetime.now(tz=timezone.utc).astimezone()
     today_date = today.date().isoformat()
     this_year = today.year
 
-    member = contact
-    logger.info(
-        f" - {member['first_name']} {member['last_name']} <{member['email']}> ({member.get('conscribo_id')})"
-    )
-
-    if dry_run:
-        return
-
     birthdays = []
     date_of_birth = member.get("date_of_birth")
     if date_of_birth:
@@ -174,7 +182,6 @@ def do_add(contact, logger: logging.Logger, dry_run: bool, service, group):
             next_birthday = next_year_birthday
             age_at_next_birthday += 1
 
-    anon_number = get_fresh_anon_number()
     anon_email = f"member{anon_number}@anon.sib-utrecht.nl"
     phone_number = member.get("phone_number", None)
 
@@ -217,20 +224,63 @@ def do_add(contact, logger: logging.Logger, dry_run: bool, service, group):
             {"value": phone_number, "type": "mobile", "formattedType": "Mobile"}
         ]
 
-    # Create contact in Google Contacts
-    created_contact = service.people().createContact(body=contact).execute()
-    sleep(0.3)
-    
-    # Add to the contact group
-    service.contactGroups().members().modify(
-        resourceName=group["resourceName"],
-        body={"resourceNamesToAdd": [created_contact["resourceName"]]}
-    ).execute()
+    return contact
+
 
-    logger.info(f"    Created contact: {created_contact.get('resourceName')}")
-    # logger.debug(json.dumps(created_contact, indent=2))
-    sleep(0.1)  # Avoid hitting rate limits
-    # break
+def chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def add_contacts(members: list[dict], logger: logging.Logger, service, group):
+    """
+    Create contacts for the given members and add them to the group, using
+    batchCreateContacts and a single members.modify call per chunk.
+    """
+    anon_numbers = get_fresh_anon_numbers(len(members))
+    contacts = [
+        build_contact(member, anon_number)
+        for member, anon_number in zip(members, anon_numbers)
+    ]
+
+    for chunk_members, chunk in zip(
+        chunks(members, CREATE_BATCH_SIZE), chunks(contacts, CREATE_BATCH_SIZE)
+    ):
+        result = service.people().batchCreateContacts(
+            body={
+                "contacts": [{"contactPerson": contact} for contact in chunk],
+                "readMask": "names,emailAddresses",
+            }
+        ).execute()
+
+        # The responses are in the order of the request
+        created_names = []
+        for member, response in zip(chunk_members, result.get("createdPeople", [])):
+            resource_name = (response.get("person") or {}).get("resourceName")
+            if resource_name is None:
+                logger.error(
+                    f"    Failed to create contact for {member.get('conscribo_id')}: "
+                    f"{json.dumps(response.get('status'))}"
+                )
+                continue
+
+            logger.info(f"    Created contact: {resource_name}")
+            created_names.append(resource_name)
+
+        # Label the chunk right away, so a failure in a later chunk does not
+        # leave unlabelled contacts that the next sync would create again.
+        if created_names:
+            service.contactGroups().members().modify(
+                resourceName=group["resourceName"],
+                body={"resourceNamesToAdd": created_names}
+            ).execute()
+
+
+def delete_contacts(resource_names: list[str], service):
+    for chunk in chunks(resource_names, DELETE_BATCH_SIZE):
+        service.people().batchDeleteContacts(
+            body={"resourceNames": chunk}
+        ).execute()
 
 
 def sync_conscribo_to_google_contacts(dry_run=False, logger: logging.Logger | None = None) -> int:
@@ -244,8 +294,7 @@ def sync_conscribo_to_google_contacts(dry_run=False, logger: logging.Logger | No
     try:
         print_header("Syncing Conscribo members to Google Contacts...", logger)
 
-        creds = get_credentials(CONTACTS_SCOPES)
-        service = build("people", "v1", credentials=creds)
+        service = get_service("people", "v1", CONTACTS_SCOPES)
 
         group = get_contact_group(service, GOOGLE_CONTACTS_MEMBER_LABEL)
         if not group:
@@ -259,7 +308,7 @@ def sync_conscribo_to_google_contacts(dry_run=False, logger: logging.Logger | No
         members = list_relations_active_members()
         members_by_conscribo_id = {member["conscribo_id"]: member for member in members}
 
-        contacts = list_google_contacts(label_name=GOOGLE_CONTACTS_MEMBER_LABEL)
+        contacts = list_google_contacts(label_name=GOOGLE_CONTACTS_MEMBER_LABEL, service=service)
         contacts_by_conscribo_id = {
             contact.get("conscribo_id"): contact for contact in contacts
         }
@@ -282,11 +331,17 @@ def sync_conscribo_to_google_contacts(dry_run=False, logger: logging.Logger | No
         change_count = len(would_add) + len(would_remove)
 
         logger.info("Add: ")
-        for conscribo_id in would_add:
-            member = members_by_conscribo_id[conscribo_id]
-            do_add(member, logger, dry_run, service=service, group=group)
+        to_add = [members_by_conscribo_id[conscribo_id] for conscribo_id in would_add]
+        for member in to_add:
+            logger.info(
+                f" - {member['first_name']} {member['last_name']} <{member['email']}> ({member.get('conscribo_id')})"
+            )
+
+        if not dry_run and to_add:
+            add_contacts(to_add, logger, service=service, group=group)
 
         logger.info("Remove: ")
+        to_remove = []
         for conscribo_id in would_remove:
             contact = contacts_by_conscribo_id[conscribo_id]
             logger.info(
@@ -304,9 +359,11 @@ def sync_conscribo_to_google_contacts(dry_run=False, logger: logging.Logger | No
                 )
                 continue
 
-            # Remove contact from Google Contacts
-            service.people().deleteContact(resourceName=resource_name).execute()
-            sleep(0.1)
+            to_remove.append(resource_name)
+
+        # Remove contacts from Google Contacts
+        if to_remove:
+            delete_contacts(to_remove, service)
 
         print_change_count(change_count, logger)
         return change_count
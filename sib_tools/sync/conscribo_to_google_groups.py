@@ -8,21 +8,47 @@ from sib_tools.conscribo.relations import (
 )
 from sib_tools.google.auth import (
     list_group_members_api,
-    get_credentials,
+    get_service,
     directory_scopes,
 )
-from googleapiclient.discovery import build
-from time import sleep
 import logging
 from datetime import datetime, timezone
 from ..utils import print_change_count, print_header
 
+# Requests per batch of member inserts or deletes
+MEMBER_BATCH_SIZE = 50
+
+GROUP_EMAILS = {
+    "alumni": "alumni@sib-utrecht.nl",
+    "members": "members@sib-utrecht.nl",
+}
+
+
+def execute_member_batch(service, requests: list[tuple[str, object]], action: str, logger: logging.Logger):
+    """
+    Send (email, request) pairs in batch requests, and log a warning for each
+    request that failed.
+    """
+    def callback(request_id, response, exception):
+        if exception is not None:
+            email = requests[int(request_id)][0]
+            logger.warning(f"Failed to {action} {email}: {exception}")
+
+    for start in range(0, len(requests), MEMBER_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=callback)
+        for i in range(start, min(start + MEMBER_BATCH_SIZE, len(requests))):
+            batch.add(requests[i][1], request_id=str(i))
+
+        try:
+            batch.execute()
+        except Exception as e:
+            logger.warning(f"Failed to {action} batch of {len(requests[start:start + MEMBER_BATCH_SIZE])} members: {e}")
+
 
 def sync_group_to_emails(group_email, emails, dry_run=True, logger: logging.Logger | None = None) -> int:
     logger = logger or logging.getLogger(__name__)
 
-    creds = get_credentials(directory_scopes)
-    service = build("admin", "directory_v1", credentials=creds)
+    service = get_service("admin", "directory_v1", directory_scopes)
 
     logger.info(f"Syncing group: {group_email}. Got {len(emails)} emails")
     logger.info(f"Dry run: {dry_run}")
@@ -69,48 +95,84 @@ def sync_group_to_emails(group_email, emails, dry_run=True, logger: logging.Logg
     # Remove extra members from Google Group
     for email in will_remove:
         logger.info(f"Removing {email} from {group_email}")
-        if dry_run:
-            continue
 
-        try:
-            service.members().delete(groupKey=group_email, memberKey=email).execute()
-        except Exception as e:
-            logger.warning(f"Failed to remove {email}: {e}")
-        sleep(0.2)
+    if not dry_run:
+        execute_member_batch(
+            service,
+            [
+                (email, service.members().delete(groupKey=group_email, memberKey=email))
+                for email in will_remove
+            ],
+            "remove",
+            logger,
+        )
 
     logger.info("")
     # Add missing members to Google Group
     for email in will_add:
         logger.info(f"Adding {email} to {group_email}")
-        if dry_run:
-            continue
 
-        try:
-            service.members().insert(
-                groupKey=group_email, body={"email": email, "role": "MEMBER"}
-            ).execute()
-        except Exception as e:
-            logger.warning(f"Failed to add {email}: {e}")
-        sleep(0.2)
+    if not dry_run:
+        execute_member_batch(
+            service,
+            [
+                (
+                    email,
+                    service.members().insert(
+                        groupKey=group_email, body={"email": email, "role": "MEMBER"}
+                    ),
+                )
+                for email in will_add
+            ],
+            "add",
+            logger,
+        )
 
     print_change_count(change_count, logger)
     return change_count
 
 
+def sync_all_google_groups(dry_run=True, logger: logging.Logger | None = None) -> int:
+    """
+    Synchronize both the alumni and the members group, concurrently. The log
+    reads the same as syncing them one after another.
+    """
+    from .orchestrator import Stage, run_stages
+
+    logger = logger or logging.getLogger(__name__)
+
+    stages = [
+        Stage(
+            f"google-groups-{group}",
+            lambda logger, group=group: sync_conscribo_to_google_groups(
+                dry_run=dry_run, group=group, logger=logger
+            ),
+        )
+        for group in GROUP_EMAILS
+    ]
+    # Each group sync logs its own change count, like a sequential run
+    return run_stages(
+        stages, logger, jobs=len(stages), prefetch=None, report_total=False
+    )
+
+
 def sync_conscribo_to_google_groups(dry_run=True, group="alumni", logger: logging.Logger | None = None) -> int:
     """
     Synchronize Conscribo members to Google Groups.
-    group: 'alumni' or 'members'
+    group: 'alumni', 'members' or 'all'
     """
     logger = logger or logging.getLogger(__name__)
 
+    if group == "all":
+        return sync_all_google_groups(dry_run=dry_run, logger=logger)
+
     print_header(f"Syncing Conscribo emails to Google Group ({group})...", logger)
 
     if group == "alumni":
         logger.info("Syncing alumni emails:")
         alumni = list_relations_active_alumni()
         emails = set(a.get("email") for a in alumni) - {"", None}
-        return sync_group_to_emails("alumni@sib-utrecht.nl", emails, dry_run=dry_run, logger=logger)
+        return sync_group_to_emails(GROUP_EMAILS["alumni"], emails, dry_run=dry_run, logger=logger)
     elif group == "members":
         logger.info("Syncing members emails:")
         members = list_relations_active_members()
@@ -128,6 +190,6 @@ def sync_conscribo_to_google_groups(dry_run=True, group="alumni", logger: loggin
         logger.info(f"Excluding {prev_members_length - next_members_length} members who aren't members yet (by their Conscribo membership_start field).")
 
         emails = set(a.get("email") for a in members) - {"", None}
-        return sync_group_to_emails("members@sib-utrecht.nl", emails, dry_run=dry_run, logger=logger)
+        return sync_group_to_emails(GROUP_EMAILS["members"], emails, dry_run=dry_run, logger=logger)
     else:
         raise ValueError(f"Unknown group: {group}")
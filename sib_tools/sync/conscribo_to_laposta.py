@@ -1,5 +1,3 @@
-import boto3
-from time import sleep
 import json
 import logging
 import sys
@@ -13,10 +11,10 @@ from ..conscribo.relations import (
 from ..conscribo.groups import get_block_email_members
 
 from ..canonical import canonical_key
-from ..canonical.canonical_key import flatten_dict, get_key_to_laposta, expand_dict
-from ..laposta import auth
+from ..canonical.canonical_key import flatten_dict, get_schema, expand_dict
 from ..laposta import list_members
 from ..laposta.list_members import get_aggregated_relations
+from ..laposta.writer import MemberMutations, Mutation, apply_mutations
 from datetime import datetime
 from ..utils import print_change_count, print_header
 
@@ -282,9 +280,10 @@ def sync_conscribo_to_laposta(dry_run=True, logger: logging.Logger | None = None
 
         current_and_desired.append((laposta_member, desired))
 
-    key_to_laposta = get_key_to_laposta()
+    key_to_laposta = get_schema().from_key["Laposta"]
 
     change_count = 0
+    mutations: list[MemberMutations] = []
 
     for entry in current_and_desired:
         laposta_member, desired = entry
@@ -349,6 +348,8 @@ def sync_conscribo_to_laposta(dry_run=True, logger: logging.Logger | None = None
 
         logger.info("")
         logger.info(f"UPDATE {conscribo_id} {json.dumps(basic_info)}")
+        member_mutations = MemberMutations(desired["email"])
+        mutations.append(member_mutations)
 
         for list_id in remove_lists:
             logger.info(f"  Removing {laposta_member['email']} from list {list_id}")
@@ -367,11 +368,7 @@ def sync_conscribo_to_laposta(dry_run=True, logger: logging.Logger | None = None
                 logger.debug("Dry run, not executing")
                 continue
 
-            response = auth.laposta_delete(
-                url
-            )
-            logger.debug(f"Response: {json.dumps(response)}")
-            sleep(2)
+            member_mutations.mutations.append(Mutation("DELETE", url, list_id))
 
         for list_id in add_lists:
             logger.info(f"  Adding {desired['email']} to list {list_id}")
@@ -405,13 +402,12 @@ def sync_conscribo_to_laposta(dry_run=True, logger: logging.Logger | None = None
                 logger.debug("Dry run, not executing")
                 continue
 
-            response = auth.laposta_post(
-                f"/v2/member",
-                payload,
+            member_mutations.mutations.append(
+                Mutation("POST", "/v2/member", list_id, payload)
             )
 
-            logger.debug(f"Response: {json.dumps(response)}")
-            sleep(2)
+    # Send the mutations concurrently, within Laposta's rate budget
+    apply_mutations(mutations, logger)
 
     print_change_count(change_count, logger)
     return change_count
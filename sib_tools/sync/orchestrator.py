@@ -0,0 +1,209 @@
+"""
+Runs the syncs of `sync all` concurrently.
+
+The Conscribo data shared by the syncs is fetched once up front. Each sync is a
+stage that may depend on other stages, e.g. the WordPress sync needs the Cognito
+users to exist. Stages whose dependencies are done run concurrently on a thread
+pool.
+
+Every stage logs to its own buffer. The buffers are replayed to the sync logger
+in the order the stages are declared, as soon as all earlier stages are done,
+so the log (and the mailed report) reads the same as a sequential run.
+"""
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+from ..utils import print_change_count
+
+DEFAULT_JOBS = 4
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[logging.Logger], int]
+    depends_on: tuple[str, ...] = ()
+
+
+@dataclass
+class StageResult:
+    records: list[logging.LogRecord] = field(default_factory=list)
+    change_count: int = 0
+    error: BaseException | None = None
+    skipped: bool = False
+
+
+class BufferHandler(logging.Handler):
+    def __init__(self, records: list[logging.LogRecord]):
+        super().__init__()
+        self.records = records
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+def get_all_stages(dry_run: bool) -> list[Stage]:
+    """
+    The stages of `sync all`, in the order their output is reported.
+    """
+    from .conscribo_to_cognito import sync_conscribo_to_cognito
+    from .conscribo_to_laposta import sync_conscribo_to_laposta
+    from .conscribo_to_cognito_groups import sync_conscribo_to_cognito_groups
+    from .conscribo_to_google_contacts import sync_conscribo_to_google_contacts
+    from .conscribo_to_google_groups import sync_conscribo_to_google_groups
+    from .cognito_to_wp import sync_cognito_to_wp
+
+    return [
+        Stage(
+            "cognito",
+            lambda logger: sync_conscribo_to_cognito(dry_run=dry_run, logger=logger),
+        ),
+        Stage(
+            "laposta",
+            lambda logger: sync_conscribo_to_laposta(dry_run=dry_run, logger=logger),
+        ),
+        Stage(
+            "cognito-groups",
+            lambda logger: sync_conscribo_to_cognito_groups(dry_run=dry_run, logger=logger),
+            depends_on=("cognito",),
+        ),
+        Stage(
+            "google-contacts",
+            lambda logger: sync_conscribo_to_google_contacts(dry_run=dry_run, logger=logger),
+        ),
+        # Syncs both alumni and members for Google Groups
+        Stage(
+            "google-groups",
+            lambda logger: sync_conscribo_to_google_groups(
+                dry_run=dry_run, group="all", logger=logger
+            ),
+        ),
+        Stage(
+            "cognito_to_wp",
+            lambda logger: sync_cognito_to_wp(dry_run=dry_run, logger=logger),
+            depends_on=("cognito",),
+        ),
+    ]
+
+
+def prefetch_conscribo(executor: ThreadPoolExecutor):
+    """
+    Fetch the Conscribo relations and groups that the stages read, so that they
+    are served from the relation cache instead of being fetched by every stage.
+    """
+    from ..conscribo.relations import (
+        ENTITY_TYPE_ALUMNUS,
+        ENTITY_TYPE_PERSON,
+        list_relations_raw,
+    )
+    from ..conscribo.groups import list_entity_groups
+
+    futures = [
+        executor.submit(list_relations_raw, ENTITY_TYPE_PERSON),
+        executor.submit(list_relations_raw, ENTITY_TYPE_ALUMNUS),
+        executor.submit(list_entity_groups),
+    ]
+    for future in futures:
+        future.result()
+
+
+def run_stage(stage: Stage, parent: logging.Logger, result: StageResult):
+    logger = parent.getChild(stage.name)
+    logger.propagate = False
+    logger.handlers.clear()
+    logger.addHandler(BufferHandler(result.records))
+
+    try:
+        result.change_count = stage.run(logger)
+    except Exception as e:
+        result.error = e
+
+
+def run_stages(
+    stages: list[Stage],
+    logger: logging.Logger,
+    jobs: int = DEFAULT_JOBS,
+    prefetch: Callable[[ThreadPoolExecutor], None] | None = prefetch_conscribo,
+    report_total: bool = True,
+) -> int:
+    """
+    Run the stages, respecting their dependencies, and return the total change
+    count. If a stage fails, no new stages are started, the stages already
+    running are finished and reported, and the first error is raised.
+
+    The total is logged unless report_total is False, for stages run within
+    another stage, which reports its own count.
+    """
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        unknown = set(stage.depends_on) - names
+        if unknown:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages {unknown}")
+
+    results = {stage.name: StageResult() for stage in stages}
+    finished: set[str] = set()
+    running: dict[Future, Stage] = {}
+    pending = list(stages)
+    replayed = 0
+
+    def replay_finished():
+        nonlocal replayed
+        while replayed < len(stages) and stages[replayed].name in finished:
+            stage = stages[replayed]
+            for record in results[stage.name].records:
+                logger.handle(record)
+            if results[stage.name].skipped:
+                logger.warning(f"Skipped sync of {stage.name} after an earlier failure.")
+            replayed += 1
+
+    jobs = max(1, jobs)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="sync") as executor:
+        if prefetch is not None:
+            prefetch(executor)
+
+        while pending or running:
+            failed = any(results[name].error is not None for name in finished)
+            for stage in list(pending):
+                if failed:
+                    results[stage.name].skipped = True
+                    finished.add(stage.name)
+                    pending.remove(stage)
+                elif len(running) < jobs and all(
+                    dep in finished for dep in stage.depends_on
+                ):
+                    pending.remove(stage)
+                    future = executor.submit(run_stage, stage, logger, results[stage.name])
+                    running[future] = stage
+
+            if running:
+                done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished.add(running.pop(future).name)
+                    # Only re-raises what run_stage does not catch, like
+                    # KeyboardInterrupt
+                    future.result()
+
+            replay_finished()
+
+    errors = [(s.name, results[s.name].error) for s in stages if results[s.name].error]
+    if errors:
+        for name, error in errors[1:]:
+            logger.error(f"Sync of {name} also failed: {error!r}")
+        raise errors[0][1]  # type: ignore
+
+    total = sum(results[s.name].change_count for s in stages)
+    if report_total:
+        print_change_count(total, logger)
+    return total
+
+
+def sync_all(
+    dry_run: bool = True,
+    logger: logging.Logger | None = None,
+    jobs: int = DEFAULT_JOBS,
+) -> int:
+    logger = logger or logging.getLogger(__name__)
+    return run_stages(get_all_stages(dry_run), logger, jobs=jobs)
@@ -4,8 +4,8 @@ import logging
 import sys
 import io
 
-from sib_tools.utils import print_change_count
 from .check_command import mail_results, log_to_html
+from .sync.orchestrator import DEFAULT_JOBS
 
 def handle_sync(args: Namespace):
     """
@@ -42,31 +42,28 @@ def handle_sync(args: Namespace):
 
     logger.info(f"Running sync: dest={args.dest}, dry_run={getattr(args, 'dry_run', False)}")
 
+    if getattr(args, "laposta_bulk", False):
+        from .laposta.writer import enable_bulk_upsert
+
+        enable_bulk_upsert()
+
+    if getattr(args, "incremental", False):
+        from .conscribo.relations import enable_incremental_fetch
+        from .google.contacts import enable_incremental_fetch as enable_incremental_contacts
+
+        enable_incremental_fetch()
+        enable_incremental_contacts()
+
     change_count = 0
     try:
         if args.dest == "all":
-            # Run all syncs and sum their change counts
-            from .sync.conscribo_to_cognito import sync_conscribo_to_cognito
-            from .sync.conscribo_to_laposta import sync_conscribo_to_laposta
-            from .sync.conscribo_to_cognito_groups import sync_conscribo_to_cognito_groups
-            from .sync.cognito_to_conscribo_groups import sync_cognito_to_conscribo_groups
-            from .sync.conscribo_to_google_contacts import sync_conscribo_to_google_contacts
-            from .sync.conscribo_to_google_groups import sync_conscribo_to_google_groups
-            from .sync.cognito_to_wp import sync_cognito_to_wp
-
-            total = 0
-            total += sync_conscribo_to_cognito(dry_run=args.dry_run, logger=logger)
-            total += sync_conscribo_to_laposta(dry_run=args.dry_run, logger=logger)
-            total += sync_conscribo_to_cognito_groups(dry_run=args.dry_run, logger=logger)
-            total += sync_conscribo_to_google_contacts(dry_run=args.dry_run, logger=logger)
-            # Run both alumni and members for Google Groups
-            total += sync_conscribo_to_google_groups(dry_run=args.dry_run, group="alumni", logger=logger)
-            total += sync_conscribo_to_google_groups(dry_run=args.dry_run, group="members", logger=logger)
-            total += sync_cognito_to_wp(dry_run=args.dry_run, logger=logger)
-
-            print_change_count(total, logger)
+            # Run all syncs, independent ones concurrently, and sum their
+            # change counts
+            from .sync.orchestrator import sync_all
 
-            change_count = total
+            change_count = sync_all(
+                dry_run=args.dry_run, logger=logger, jobs=getattr(args, "jobs", DEFAULT_JOBS)
+            )
             return
 
         if args.dest == "cognito":
@@ -131,6 +128,9 @@ def handle_sync(args: Namespace):
 
         raise ValueError(f"Unknown destination: {args.dest}")
     finally:
+        from .conscribo.relation_cache import relation_cache
+
+        logger.debug(f"Conscribo relation cache: {relation_cache.stats()}")
         logger.info("")
 
         # Prepare and optionally mail results
@@ -174,9 +174,9 @@ def add_parse_args(parser: ArgumentParser):
     )
     parser.add_argument(
         "--group",
-        choices=["members", "alumni"],
+        choices=["members", "alumni", "all"],
         default="alumni",
-        help="(Only applies to 'google-groups') Which group to sync: 'members' or 'alumni' (default: alumni)",
+        help="(Only applies to 'google-groups') Which group to sync: 'members', 'alumni' or 'all' (default: alumni)",
     )
     parser.add_argument(
         "--group-id",
@@ -190,6 +190,23 @@ def add_parse_args(parser: ArgumentParser):
         default="members",
         help="(Only applies to 'conscribo-list') Which member type to sync: 'members' or 'alumni' (default: members)",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Fetch Conscribo relations and Google Contacts through local snapshots, only transferring what changed since the last run when possible. For Conscribo this needs CONSCRIBO_MODIFIED_FIELD or CONSCRIBO_PROBE_FIELDS to be set.",
+    )
+    parser.add_argument(
+        "--laposta-bulk",
+        action="store_true",
+        help="Send Laposta additions through the bulk member endpoint, many members per request.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=DEFAULT_JOBS,
+        help="(Only applies to 'all') How many syncs to run concurrently. Use 1 to run them one after another.",
+    )
     parser.add_argument(
         "--mail-output",
         action="store_true",
@@ -0,0 +1,117 @@
+import itertools
+import json
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from sib_tools import file_cache
+from sib_tools.conscribo.file_cache import make_cache_key, migrate_json_files
+from sib_tools.file_cache import FileCache
+
+# json.dumps of this value is 100 bytes
+VALUE = "x" * 98
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """
+    A clock that advances by more than TOUCH_INTERVAL on every call, so
+    entries have distinct last use times and every read updates them.
+    """
+    ticks = itertools.count(1_000_000, file_cache.TOUCH_INTERVAL + 1)
+    monkeypatch.setattr(file_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def make_cache(tmp_path, max_bytes=1000) -> FileCache:
+    return FileCache(str(tmp_path / "cache.sqlite"), max_bytes=max_bytes, compress=False)
+
+
+def test_round_trip(tmp_path):
+    cache = FileCache(str(tmp_path / "cache.sqlite"))
+    cache.put("key", {"a": [1, 2, 3]})
+
+    assert cache.get("key") == {"a": [1, 2, 3]}
+    assert "key" in cache
+    assert cache.get("other", "default") == "default"
+
+
+def test_eviction_frees_down_to_fraction(tmp_path):
+    cache = make_cache(tmp_path)
+    for i in range(10):
+        cache.put(f"key{i}", VALUE)
+    # Reading key0 makes key1 the least recently used entry
+    cache.get("key0")
+    assert cache.total_bytes == 1000
+
+    cache.put("key10", VALUE)
+
+    kept = {key for key, _ in cache.items()}
+    assert len(kept) == int(1000 * file_cache.EVICT_TO_FRACTION) // 100
+    assert kept == {"key0"} | {f"key{i}" for i in range(3, 11)}
+    assert cache.total_bytes == cache.sum_sizes() == 900
+
+
+def test_running_total_follows_changes(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=10_000)
+    cache.put_many([("a", VALUE), ("b", VALUE), ("c", "short")])
+    cache.put("a", "replaced")
+    cache.delete("b")
+    cache.delete("missing")
+    assert cache.total_bytes == cache.sum_sizes()
+
+    cache.remove_unused(0)
+    assert cache.total_bytes == cache.sum_sizes() == 0
+
+
+def test_put_many_rolls_back_total_on_failure(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    cache.put("kept", VALUE)
+
+    def fail():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(cache, "evict", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        cache.put_many([("a", VALUE), ("b", VALUE)])
+
+    assert [key for key, _ in cache.items()] == ["kept"]
+    assert cache.total_bytes == cache.sum_sizes() == 100
+
+
+def test_migrate_only_cache_files(tmp_path):
+    cache_dir = tmp_path / "pdok_cache"
+    cache_dir.mkdir()
+    with_postal_code = make_cache_key("https://example.com/a", postal_code="1234AB")
+    without_postal_code = make_cache_key("https://example.com/b")
+    half_written = make_cache_key("https://example.com/c", postal_code="1234AC")
+
+    (cache_dir / with_postal_code).write_text(json.dumps({"a": 1}))
+    (cache_dir / without_postal_code).write_text(json.dumps({"b": 2}))
+    (cache_dir / half_written).write_text('{"c": ')
+    (cache_dir / "notes.json").write_text(json.dumps({"keep": True}))
+    (cache_dir / "README").write_text("keep")
+
+    cache = make_cache(tmp_path)
+    migrate_json_files(str(cache_dir), cache)
+
+    assert dict(cache.items()) == {with_postal_code: {"a": 1}, without_postal_code: {"b": 2}}
+    assert sorted(p.name for p in cache_dir.iterdir()) == ["README", "notes.json"]
+
+
+def test_migrate_keeps_files_if_storing_fails(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "pdok_cache"
+    cache_dir.mkdir()
+    key = make_cache_key("https://example.com/a", postal_code="1234AB")
+    (cache_dir / key).write_text(json.dumps({"a": 1}))
+
+    cache = make_cache(tmp_path)
+
+    def fail(items):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "put_many", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        migrate_json_files(str(cache_dir), cache)
+
+    assert (cache_dir / key).exists()
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from sib_tools.conscribo.relation_cache import RelationSnapshotCache
+
+
+def test_get_or_fetch_fetches_once_within_ttl():
+    cache = RelationSnapshotCache(ttl=timedelta(minutes=10))
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return [{"code": 1}]
+
+    assert cache.get_or_fetch(("relations", "persoon", ("code",)), fetch) == [{"code": 1}]
+    assert cache.get_or_fetch(("relations", "persoon", ("code",)), fetch) == [{"code": 1}]
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_expired_entries_are_fetched_again():
+    cache = RelationSnapshotCache(ttl=timedelta(seconds=-1))
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_fetch("key", fetch) == 1
+    assert cache.get_or_fetch("key", fetch) == 2
+    assert cache.get("key") is None
+
+
+def test_invalidate_entity_type_keeps_other_entries():
+    cache = RelationSnapshotCache()
+    cache.put(("relations", "persoon", ("code",)), ["person"])
+    cache.put(("relations", "re__nisten", ("code",)), ["alumnus"])
+    cache.put(("fieldDefinitions", "persoon"), ["field"])
+
+    cache.invalidate("persoon")
+
+    assert cache.get(("relations", "persoon", ("code",))) is None
+    assert cache.get(("relations", "re__nisten", ("code",))) == ["alumnus"]
+    assert cache.get(("fieldDefinitions", "persoon")) == ["field"]
+
+
+def test_invalidate_all_keeps_field_definitions():
+    cache = RelationSnapshotCache()
+    cache.put(("relations", "persoon", ("code",)), ["person"])
+    cache.put(("relations", "re__nisten", ("code",)), ["alumnus"])
+    cache.put(("fieldDefinitions", "persoon"), ["field"])
+
+    cache.invalidate()
+
+    assert cache.get(("relations", "persoon", ("code",))) is None
+    assert cache.get(("relations", "re__nisten", ("code",))) is None
+    assert cache.get(("fieldDefinitions", "persoon")) == ["field"]
@@ -0,0 +1,120 @@
+import sqlite3
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from sib_tools.conscribo import finance, transaction_store
+
+
+def transaction(transaction_id, day, amount, account_nr=100, side="debet"):
+    return {
+        "transactionId": transaction_id,
+        "date": day,
+        "transactionRows": {"1": {"accountNr": account_nr, "side": side, "amount": amount}},
+    }
+
+
+@pytest.fixture
+def conscribo(monkeypatch):
+    """
+    Fake Conscribo, returning its transactions within the requested range and
+    recording the requested ranges.
+    """
+    fake = {"transactions": [], "requests": []}
+
+    def iter_conscribo_transactions(start, end, **kwargs):
+        fake["requests"].append((start, end))
+        return iter([tx for tx in fake["transactions"] if start <= tx["date"] <= end])
+
+    monkeypatch.setattr(finance, "iter_conscribo_transactions", iter_conscribo_transactions)
+    return fake
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "transactions.sqlite")
+
+
+def test_to_units_is_exact():
+    assert transaction_store.to_units("0.1") == 1_000
+    assert transaction_store.to_units(12.34) == 123_400
+    with pytest.raises(ValueError):
+        transaction_store.to_units("0.00001")
+
+
+def test_sums_are_exact_decimals(conscribo, store_path):
+    conscribo["transactions"] = [
+        transaction(i, "2025-01-05", "0.1") for i in range(10)
+    ] + [transaction(10, "2025-01-06", "2.5", side="credit")]
+
+    debet, credit = transaction_store.get_balance_diff(
+        "2025-01-01", "2025-01-31", path=store_path
+    )
+
+    assert debet == {100: Decimal("1")}
+    assert credit == {100: Decimal("2.5")}
+
+
+def test_cached_range_is_not_fetched_again(conscribo, store_path):
+    conscribo["transactions"] = [transaction(1, "2025-01-05", "1")]
+
+    transaction_store.ensure_range("2025-01-01", "2025-01-31", path=store_path)
+    transaction_store.ensure_range("2025-01-10", "2025-02-10", path=store_path)
+
+    assert conscribo["requests"] == [
+        ("2025-01-01", "2025-01-31"),
+        ("2025-02-01", "2025-02-10"),
+    ]
+
+
+def test_expired_range_is_replaced(conscribo, store_path):
+    conscribo["transactions"] = [
+        transaction(1, "2025-01-05", "1"),
+        transaction(2, "2025-01-06", "2"),
+    ]
+    transaction_store.ensure_range("2025-01-01", "2025-01-31", path=store_path)
+
+    conn = sqlite3.connect(store_path)
+    fetched_at = date.today() - timedelta(days=transaction_store.MAX_RANGE_AGE_DAYS + 1)
+    conn.execute("UPDATE fetched_ranges SET fetched_at = ?", (fetched_at.isoformat(),))
+    conn.commit()
+    conn.close()
+
+    # Deleted in Conscribo in the meantime
+    del conscribo["transactions"][1]
+    debet, _ = transaction_store.get_balance_diff(
+        "2025-01-01", "2025-01-31", path=store_path
+    )
+
+    assert conscribo["requests"][-1] == ("2025-01-01", "2025-01-31")
+    assert debet == {100: Decimal("1")}
+
+
+def test_recent_days_are_not_cached(conscribo, store_path):
+    today = date.today()
+    start = (today - timedelta(days=30)).isoformat()
+    last_final_day = (today - timedelta(days=transaction_store.RECENT_DAYS)).isoformat()
+
+    transaction_store.ensure_range(start, today.isoformat(), path=store_path)
+    transaction_store.ensure_range(start, today.isoformat(), path=store_path)
+
+    conn = sqlite3.connect(store_path)
+    ranges = conn.execute("SELECT start, end FROM fetched_ranges").fetchall()
+    conn.close()
+
+    assert ranges == [(start, last_final_day)]
+    assert conscribo["requests"] == [
+        (start, today.isoformat()),
+        (transaction_store.day_after(last_final_day), today.isoformat()),
+    ]
+
+
+def test_refresh_fetches_cached_range_again(conscribo, store_path):
+    transaction_store.ensure_range("2025-01-01", "2025-01-31", path=store_path)
+    transaction_store.ensure_range("2025-01-01", "2025-01-31", refresh=True, path=store_path)
+
+    assert conscribo["requests"] == [
+        ("2025-01-01", "2025-01-31"),
+        ("2025-01-01", "2025-01-31"),
+    ]